@@ -7,18 +7,50 @@
 # calculated, indicating the convergence of the mean value.
 # When calculate_sample_size_distributions is true, the mean and uncertainty of the 
 # deviations is calculated for subsample sizes ranging from 4-20.
-# Each routine creates a pickle file that can be read and plotted by Appendix-plotting.py
+# Each routine creates a result directory (see MC_store.py) that can be read and plotted by Appendix-plotting.py
 # Date: Sept 25 2020
 # By: Karel Kok
 
+import os
+import shutil
 import numpy as np
-import pickle
-from random import sample
+import MC_convergence
+import MC_sampling
+import MC_parallel
+import MC_adaptive
+import MC_streaming
+import MC_store
+import MC_cache
+import MC_instrument
 
 # Chose which parts of the simulation have to be calculated
 calculate_distributions = True
 calculate_convergence = True # Requires calculate_distributions to be true
+population_seed = 2 # Seed of the base set
+chunk_size = 10000 # Number of subsamples that are drawn and evaluated at once, every chunk has its own seed stream
+sampling_seed = 2 # Seed of the random draws of the subsamples, None draws a new seed every run
+bootstrap = False # Draw the subsamples with replacement instead of without replacement
+stream_distributions = False # Only keep the histograms and moments of the distributions instead of every deviation, which keeps the memory use constant. The convergence is then recorded at convergence_points (default 1000) log-spaced checkpoints
+convergence_points = None # Number of log-spaced repetition counts at which the convergence is stored, None stores every repetition
 calculate_sample_size_distributions = True
+sweep_workers = None # Number of processes used for the sample size sweep, None uses all cores
+adaptive_tolerance = None # When set, every (N, measure) cell of the sample size sweep is repeated until the standard error of its mean deviation is below this value, instead of a fixed 10000 times
+adaptive_max_repetitions = 1000000 # Maximum number of repetitions of a cell in the adaptive sweep
+adaptive_min_repetitions = 1000 # Minimum number of repetitions of a cell in the adaptive sweep, before it may stop
+adaptive_batch_size = 1000 # Number of repetitions after which the adaptive sweep checks whether a cell can stop
+cache_dir = None # Directory of the chunk cache (see MC_cache.py), so that only chunks that were not calculated before are calculated. None disables the cache
+cache_max_bytes = 2 * 1024**3 # Size limit of the cache, above which the least recently used chunks are removed
+instrument = False # Record the time spent in every stage and uncertainty measure, report the progress and write App-timing.json
+profile = False # Also profile the run with cProfile, written to App-timing.prof. Requires instrument to be true
+trace_memory = False # Also trace the memory use with tracemalloc. Requires instrument to be true
+
+# Parameters of the uncertainty measures, also written to the metadata of the results
+ESTIMATOR_PARAMETERS = {
+	"exclextr" : {"extremesexcluded" : 1},
+	"middle" : {"percentage" : 50},
+	"percmeas" : {"fraction" : .76},
+	"close68" : {"fraction" : 0.68},
+}
 
 def stddev(sample_set, sample = True):
 	"""Takes an array and calculates its mean and uncertainty. If the parameter sample is set to true, the returned uncertainty is the sample standard deviation for a (limited) subsample is calculated, when nothing is provided, the population standard deviation is calculated. The function returns a dictionary with keys "mean" and "uncertainty"."""
@@ -37,7 +69,7 @@ def minmax(sample_set):
 
 def exclextr(sample_set):
 	"""Takes an array and calculates its mean and uncertainty. The variable extremesexcluded indicates how many of the extreme values from the set have to be excluded. 1 indicating that 1 max and 1 min value are excluded. The uncertainty is the largest distance of the min/max to the mean. The function returns a dictionary with keys "mean" and "uncertainty"."""
-	extremesexcluded = 1
+	extremesexcluded = ESTIMATOR_PARAMETERS["exclextr"]["extremesexcluded"]
 	meanval = 1.*sum(sample_set)/len(sample_set)
 	sample_set = sorted(sample_set)[extremesexcluded:len(sample_set) - extremesexcluded]
 	mindist = meanval - min(sample_set)
@@ -47,7 +79,7 @@ def exclextr(sample_set):
 	
 def middle(sample_set):
 	"""Takes an array and calculates its mean and uncertainty. The variable percentage set at 50 indicates that 50% of the sorted set are used in the uncertainty calculation. The uncertainty is the largest distance of the min/max to the mean. The function returns a dictionary with keys "mean" and "uncertainty"."""
-	percentage = 50
+	percentage = ESTIMATOR_PARAMETERS["middle"]["percentage"]
 	meanval = 1.*sum(sample_set)/len(sample_set)
 	sample_set = sorted(sample_set)
 	cutmeasurements = int((percentage/2.)/100.*len(sample_set))
@@ -58,27 +90,10 @@ def middle(sample_set):
 	return {"mean" : meanval, "uncertainty" : uncert}
 
 def percmeas(sample_set):
-	"""Takes an array and first calculates how many items should be discarded so that the percentage of remaining measurements is the closest to a certain percentage. This percentage is set by the variable fraction. Then it calculates the min-max interval of the remaining set."""
-	fraction = .76
-	meanval = 1.*sum(sample_set)/len(sample_set)
-	differences = np.abs(sample_set - meanval)
-	# Identify the number of measurements that need to be discarded so that the remaining set contains the closest percentage to 68% of the original set as possible.
-	N = len(sample_set)
-	abs_percentage_difference = np.abs((np.arange(N)+1.)/N - fraction)
-	smallest_percentage_difference = min(abs_percentage_difference)
-	smallest_id = np.argwhere(abs_percentage_difference == smallest_percentage_difference)[0][0]
-	number_of_items_to_discard = N-(smallest_id+1)
-	
-	# Discard the biggest outliers as compared to the mean
-	for i in range(number_of_items_to_discard):
-		cut_index = np.where(differences == max(differences))[0][0]
-		sample_set = np.delete(sample_set, cut_index)
-		differences = np.delete(differences, cut_index)
-	# Calculate uncertainty
-	mindist = meanval - min(sample_set)
-	maxdist = max(sample_set) - meanval
-	uncert = max(mindist, maxdist)
-	return {"mean" : meanval, "uncertainty" : uncert}
+	"""Takes an array and first calculates how many items should be discarded so that the percentage of remaining measurements is the closest to a certain percentage. This percentage is set by the variable fraction. Then it calculates the min-max interval of the remaining set. The biggest outliers as compared to the mean are discarded, using the ordering of order_statistics."""
+	fraction = ESTIMATOR_PARAMETERS["percmeas"]["fraction"]
+	result = _closest_fraction_batch(order_statistics(np.asarray(sample_set, dtype=float)[None,:], by_value=False), fraction)
+	return {"mean" : result["mean"][0], "uncertainty" : result["uncertainty"][0]}
 	
 def mad(sample_set):
 	"""takes an array and calculates its mean and uncertainty. The uncertainty is the mean absolute deviation (MAD). The function returns a dictionary with keys "mean" and "uncertainty"."""
@@ -105,164 +120,330 @@ def iqr(sample_set):
 	return {"mean" : meanval, "uncertainty" : uncert}
 
 def close68(sample_set):
-	"""Takes an array and first calculates how many items should be discarded so that the percentage of remaining measurements is the closest to 68%. Then it calculates the min-max interval of the remaining set."""
-	meanval = 1.*sum(sample_set)/len(sample_set)
-	differences = np.abs(sample_set - meanval)
-	# Identify the number of measurements that need to be discarded so that the remaining set contains the closest percentage to 68% of the original set as possible.
-	N = len(sample_set)
-	abs_percentage_difference = np.abs((np.arange(N)+1.)/N - 0.68)
-	smallest_percentage_difference = min(abs_percentage_difference)
-	smallest_id = np.argwhere(abs_percentage_difference == smallest_percentage_difference)[0][0]
-	number_of_items_to_discard = N-(smallest_id+1)
-	
-	# Discard the biggest outliers as compared to the mean
-	for i in range(number_of_items_to_discard):
-		cut_index = np.where(differences == max(differences))[0][0]
-		sample_set = np.delete(sample_set, cut_index)
-		differences = np.delete(differences, cut_index)
-	# Calculate uncertainty
-	mindist = meanval - min(sample_set)
-	maxdist = max(sample_set) - meanval
-	uncert = max(mindist, maxdist)
+	"""Takes an array and first calculates how many items should be discarded so that the percentage of remaining measurements is the closest to 68%. Then it calculates the min-max interval of the remaining set. The biggest outliers as compared to the mean are discarded, using the ordering of order_statistics."""
+	result = _closest_fraction_batch(order_statistics(np.asarray(sample_set, dtype=float)[None,:], by_value=False), ESTIMATOR_PARAMETERS["close68"]["fraction"])
+	return {"mean" : result["mean"][0], "uncertainty" : result["uncertainty"][0]}
+
+
+# Batched versions of the uncertainty measures. Each function takes a 2D array with one subsample per row and
+# returns the same dictionary as its scalar counterpart, with arrays holding one value per row. The sums are taken
+# column by column, in the same order as the builtin sum of the scalar functions, so the results are identical.
+# The trimming and quantile based measures share the sorting done by order_statistics, which can be passed to
+# them as order, so that every subsample is sorted only once.
+def _row_sum(values):
+	"""Takes a 2D array and sums every row, adding the columns one at a time from left to right."""
+	total = values[:,0].copy()
+	for column in range(1, values.shape[1]):
+		total += values[:,column]
+	return total
+
+def _row_mean(subsets):
+	"""Takes a 2D array and returns the mean of every row."""
+	return 1.*_row_sum(subsets)/subsets.shape[1]
+
+def order_statistics(subsets, by_value = True, by_distance = True):
+	"""Takes a 2D array with one subsample per row and calculates the order information that is shared by the uncertainty measures. The returned dictionary contains the subsets, the "mean" of every row, the rows sorted by value under "sorted" (when by_value is true) and the rows ordered by decreasing distance from the mean under "by_distance" (when by_distance is true). Items at the same distance keep their order of appearance, so that discarding the first k items of by_distance discards the same items as removing the biggest outlier k times."""
+	order = {"subsets" : subsets, "mean" : _row_mean(subsets)}
+	if by_value:
+		order["sorted"] = np.sort(subsets, axis=1)
+	if by_distance:
+		# A stable sort on the negative distance puts the items in the order in which they would be discarded
+		discard_order = np.argsort(-np.abs(subsets - order["mean"][:,None]), axis=1, kind="stable")
+		order["by_distance"] = np.take_along_axis(subsets, discard_order, axis=1)
+	return order
+
+def _sorted_median(sorted_subsets, start, length):
+	"""Takes a 2D array with sorted rows and returns the median of the columns start to start+length, calculated the same way as np.median."""
+	if length % 2 == 1:
+		return sorted_subsets[:,start + length//2]
+	return (sorted_subsets[:,start + length//2 - 1] + sorted_subsets[:,start + length//2]) / 2.
+
+def _discard_count(N, fraction):
+	"""Returns the number of items that have to be discarded from a set of N items, so that the fraction of remaining items is the closest to fraction."""
+	abs_percentage_difference = np.abs((np.arange(N)+1.)/N - fraction)
+	smallest_id = np.argwhere(abs_percentage_difference == min(abs_percentage_difference))[0][0]
+	return N-(smallest_id+1)
+
+def _interval(meanval, lowest, highest):
+	"""Returns the largest distance of the lowest/highest value to the mean."""
+	return np.maximum(meanval - lowest, highest - meanval)
+
+def stddev_batch(subsets, sample = True, order = None):
+	"""Batched version of stddev, calculated for every row of subsets."""
+	N = subsets.shape[1]
+	meanval = order["mean"] if order is not None else _row_mean(subsets)
+	if sample: uncert = np.sqrt(1./(N-1.) * _row_sum((subsets - meanval[:,None])**2))
+	else: uncert = np.sqrt(1./N * _row_sum((subsets - meanval[:,None])**2))
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def minmax_batch(subsets, order = None):
+	"""Batched version of minmax, calculated for every row of subsets."""
+	if order is None: order = order_statistics(subsets, by_value=False, by_distance=False)
+	if "sorted" in order: uncert = _interval(order["mean"], order["sorted"][:,0], order["sorted"][:,-1])
+	else: uncert = _interval(order["mean"], subsets.min(axis=1), subsets.max(axis=1))
+	return {"mean" : order["mean"], "uncertainty" : uncert}
+
+def exclextr_batch(subsets, order = None):
+	"""Batched version of exclextr, calculated for every row of subsets."""
+	extremesexcluded = ESTIMATOR_PARAMETERS["exclextr"]["extremesexcluded"]
+	if order is None: order = order_statistics(subsets, by_distance=False)
+	N = subsets.shape[1]
+	uncert = _interval(order["mean"], order["sorted"][:,extremesexcluded], order["sorted"][:,N - extremesexcluded - 1])
+	return {"mean" : order["mean"], "uncertainty" : uncert}
+
+def middle_batch(subsets, order = None):
+	"""Batched version of middle, calculated for every row of subsets."""
+	percentage = ESTIMATOR_PARAMETERS["middle"]["percentage"]
+	if order is None: order = order_statistics(subsets, by_distance=False)
+	N = subsets.shape[1]
+	cutmeasurements = int((percentage/2.)/100.*N)
+	uncert = _interval(order["mean"], order["sorted"][:,cutmeasurements], order["sorted"][:,N - cutmeasurements - 1])
+	return {"mean" : order["mean"], "uncertainty" : uncert}
+
+def _closest_fraction_batch(order, fraction):
+	"""Discards, for every row of the order statistics, the items that are furthest from the mean so that the fraction of remaining items is the closest to fraction, and calculates the min-max interval of the remaining items."""
+	N = order["by_distance"].shape[1]
+	remaining = order["by_distance"][:,_discard_count(N, fraction):]
+	uncert = _interval(order["mean"], remaining.min(axis=1), remaining.max(axis=1))
+	return {"mean" : order["mean"], "uncertainty" : uncert}
+
+def percmeas_batch(subsets, order = None):
+	"""Batched version of percmeas, calculated for every row of subsets."""
+	if order is None: order = order_statistics(subsets, by_value=False)
+	return _closest_fraction_batch(order, ESTIMATOR_PARAMETERS["percmeas"]["fraction"])
+
+def mad_batch(subsets, order = None):
+	"""Batched version of mad, calculated for every row of subsets."""
+	N = subsets.shape[1]
+	meanval = order["mean"] if order is not None else _row_mean(subsets)
+	uncert = 1.*_row_sum(np.abs(subsets - meanval[:,None]))/N
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def iqr_batch(subsets, order = None):
+	"""Batched version of iqr, calculated for every row of subsets."""
+	if order is None: order = order_statistics(subsets, by_distance=False)
+	N = subsets.shape[1]
+	meanval = order["mean"]
+	if (N % 2 == 0):
+		lower_bound = _sorted_median(order["sorted"], 0, int(N/2))
+		upper_bound = _sorted_median(order["sorted"], int(N/2), N - int(N/2))
+	else:
+		lower_bound = _sorted_median(order["sorted"], 0, int(N/2+1))
+		upper_bound = _sorted_median(order["sorted"], int(N/2), N - int(N/2))
+	uncert = np.maximum(np.abs(lower_bound - meanval), np.abs(upper_bound - meanval))
 	return {"mean" : meanval, "uncertainty" : uncert}
 
+def close68_batch(subsets, order = None):
+	"""Batched version of close68, calculated for every row of subsets."""
+	if order is None: order = order_statistics(subsets, by_value=False)
+	return _closest_fraction_batch(order, ESTIMATOR_PARAMETERS["close68"]["fraction"])
+
+# The batched uncertainty measures, in the order in which draw_set returns them.
+BATCH_ESTIMATORS = {
+	"minmax" : minmax_batch,
+	"exclextr" : exclextr_batch,
+	"percmeas" : percmeas_batch,
+	"middle" : middle_batch,
+	"mad" : mad_batch,
+	"iqr" : iqr_batch,
+	"close68" : close68_batch,
+	"stddev" : stddev_batch,
+}
+ESTIMATORS = tuple(BATCH_ESTIMATORS)
+# The measures that need the rows sorted by value, and the ones that need them ordered by distance from the mean
+VALUE_ORDER_ESTIMATORS = ("exclextr", "middle", "iqr")
+DISTANCE_ORDER_ESTIMATORS = ("percmeas", "close68")
+
+def uncertainties_batch(subsets, estimators = ESTIMATORS):
+	"""Takes a 2D array with one subsample per row and calculates the uncertainty of every row for the uncertainty measures in estimators. The order statistics are calculated once and shared by all measures. The function returns a dictionary with the estimator names as keys."""
+	subsets = np.asarray(subsets, dtype=float)
+	with MC_instrument.timer("order_statistics"):
+		order = order_statistics(subsets, by_value = any(name in VALUE_ORDER_ESTIMATORS for name in estimators), by_distance = any(name in DISTANCE_ORDER_ESTIMATORS for name in estimators))
+	uncertainties = {}
+	for name in estimators:
+		with MC_instrument.timer("estimator/" + name):
+			uncertainties[name] = BATCH_ESTIMATORS[name](subsets, order = order)["uncertainty"]
+	return uncertainties
+
+
+def base_set(seed = 2, mean = 100, sd = 20, size = 1000):
+	"""Returns the base set of size values, drawn from a normal distribution with the given mean and standard deviation. The legacy numpy generator seeded with seed is used, so this is identical to np.random.seed(seed) followed by np.random.normal(mean, sd, size)."""
+	return np.random.RandomState(seed).normal(mean, sd, size)
+
+def deviation_chunk(population, reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace = False, estimators = ESTIMATORS, stream = "development"):
+	"""Draws chunk number chunk_index of the no_iterations subsamples of no_draws items from the prepared population, and returns a dictionary with the deviation of every uncertainty measure in estimators from reference_stddev, expressed in reference_stddev. The draws only depend on seed, stream ("distribution" or "development", see MC_sampling.STREAMS), no_draws and chunk_index, so chunks can be calculated in any order or process."""
+	start = chunk_index * chunk_size
+	stop = min(start + chunk_size, no_iterations)
+	# Draw the SUBSETS, one per row
+	with MC_instrument.timer("sampling"):
+		rng = np.random.default_rng(MC_sampling.chunk_seed(seed, stream, no_draws, chunk_index))
+		SUBSETS = MC_sampling.draw_subsets(population, rng, stop - start, no_draws, replace)
+	MC_instrument.count("subsamples", stop - start)
+	# Calculate uncertainties
+	uncertainties = uncertainties_batch(SUBSETS, estimators)
+	return dict((name, (uncertainties[name] - reference_stddev) / reference_stddev) for name in estimators)
+
+def accumulator_chunk(population, reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace = False, estimators = ESTIMATORS, bin_edges = MC_streaming.BIN_EDGES, stream = "development"):
+	"""Like deviation_chunk, but returns a fixed-size accumulator (see MC_streaming.py) of the deviations of every uncertainty measure instead of the deviations themselves."""
+	deviations = deviation_chunk(population, reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace, estimators, stream)
+	return dict((name, MC_streaming.accumulate(deviations[name], bin_edges)) for name in estimators)
+
+def summarize_accumulators(accumulators):
+	"""Takes a dictionary with the accumulator of every uncertainty measure and returns the mean and standard deviation of every measure, in the order in which draw_set returns them."""
+	result = ()
+	for name in ESTIMATORS:
+		summary = MC_streaming.summary(accumulators[name])
+		result += (summary["mean"], summary["uncertainty"])
+	return result
+
+def reference_uncertainty(SET):
+	"""Returns the standard deviation of the complete set, to which the uncertainties of the subsamples are compared."""
+	return stddev(MC_sampling.prepare_population(SET))["uncertainty"]
+
+def stream_set(SET, no_iterations, no_draws, chunk_size = 10000, seed = None, replace = False, bin_edges = MC_streaming.BIN_EDGES, reference_stddev = None, checkpoints = None, stream = "distribution"):
+	"""Streaming version of draw_set. The deviations of every chunk are fed into a fixed-size accumulator per uncertainty measure (count, mean, M2, min/max and a histogram over bin_edges), so the memory use does not depend on no_iterations. The chunks are merged in order. The function returns a dictionary with the accumulator of every uncertainty measure. When checkpoints is given, the running moments at these numbers of repetitions are recorded as well (see MC_convergence.py), and the function returns the accumulators together with the convergence dictionary."""
+	if reference_stddev is None: reference_stddev = reference_uncertainty(SET)
+	population = MC_sampling.prepare_population(SET)
+	seed = MC_sampling.as_seed_sequence(seed)
+	accumulators = dict((name, MC_streaming.new_accumulator(bin_edges)) for name in ESTIMATORS)
+	if checkpoints is not None: moments = dict((name, MC_convergence.new_running_moments(checkpoints)) for name in ESTIMATORS)
+	progress = MC_instrument.Progress(no_iterations, "stream_set N=" + str(no_draws))
+	for chunk_index in range((no_iterations + chunk_size - 1) // chunk_size):
+		deviations = deviation_chunk(population, reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace, stream = stream)
+		for name in ESTIMATORS:
+			accumulators[name] = MC_streaming.merge(accumulators[name], MC_streaming.accumulate(deviations[name], bin_edges))
+			if checkpoints is not None: MC_convergence.update_running_moments(moments[name], deviations[name])
+		progress.update(len(deviations[ESTIMATORS[0]]))
+	if checkpoints is None:
+		return accumulators
+	return accumulators, MC_convergence.curves_from_moments(dict((name, MC_convergence.finish_running_moments(moments[name])) for name in ESTIMATORS))
+
+def draw_set(SET, no_iterations, no_draws, return_distribution, chunk_size = 10000, seed = None, replace = False, reference_stddev = None, stream = "distribution"):
+	"""Function that lets you draw no_draws from the SET (making a SUBSET), calculate the different uncertainties, calculate the difference of this uncertainty with the standard deviation of the complete set, and express this in standard deviations. This is done no_iterations times. The subsamples are drawn and evaluated in chunks of at most chunk_size rows, which limits the memory use. Every chunk draws from its own stream derived from seed (an integer or SeedSequence), so a fixed seed reproduces the same deviations. With replace set to true the subsamples are drawn with replacement. The standard deviation of the complete set is calculated from SET, unless it is given as reference_stddev. The draws come from the seed streams of stage stream, see MC_sampling.STREAMS."""
+	if reference_stddev is None: reference_stddev = reference_uncertainty(SET)
+	# Only return the mean and standard deviation of these uncertainty measures, as compared to the standard deviation of the whole set.
+	# These are calculated from the streaming accumulators, so the deviations themselves are never stored.
+	if not return_distribution:
+		return summarize_accumulators(stream_set(SET, no_iterations, no_draws, chunk_size, seed, replace, reference_stddev = reference_stddev, stream = stream))
 
-def draw_set(SET, no_iterations, no_draws, return_distribution):
-	"""Function that lets you draw no_draws from the SET (making a SUBSET), calculate the different uncertainties, calculate the difference of this uncertainty with the standard deviation of the complete set, and express this in standard deviations. This is done no_iterations times."""
+	population = MC_sampling.prepare_population(SET)
+	seed = MC_sampling.as_seed_sequence(seed)
 	# Make empty numpy arrays
-	frac_stddev_minmax = np.array([])
-	frac_stddev_exclextr = np.array([])
-	frac_stddev_percmeas = np.array([])
-	frac_stddev_middle = np.array([])
-	frac_stddev_mad = np.array([])
-	frac_stddev_iqr = np.array([])
-	frac_stddev_close68 = np.array([])
-	frac_stddev_stddev = np.array([])
-	
+	frac_stddev = dict((name, np.empty(no_iterations)) for name in ESTIMATORS)
+
+	# Run the calculational process in chunks of at most chunk_size iterations
+	progress = MC_instrument.Progress(no_iterations, "draw_set N=" + str(no_draws))
+	for chunk_index, start in enumerate(range(0, no_iterations, chunk_size)):
+		deviations = deviation_chunk(population, reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace, stream = stream)
+		for name in ESTIMATORS:
+			frac_stddev[name][start:start + len(deviations[name])] = deviations[name]
+		progress.update(len(deviations[ESTIMATORS[0]]))
 
-	# Run the calculational process no_iterations times
-	for run in range(no_iterations):
-		# Draw the SUBSET
-		SUBSET = sample(sorted(SET),no_draws)
-		# Calculate uncertainties
-		frac_stddev_minmax = np.append(frac_stddev_minmax, (minmax(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_exclextr = np.append(frac_stddev_exclextr, (exclextr(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_percmeas = np.append(frac_stddev_percmeas, (percmeas(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_middle = np.append(frac_stddev_middle, (middle(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_mad = np.append(frac_stddev_mad, (mad(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_iqr = np.append(frac_stddev_iqr, (iqr(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_close68 = np.append(frac_stddev_close68, (close68(SUBSET)["uncertainty"] - real_stddev) / real_stddev)
-		frac_stddev_stddev = np.append(frac_stddev_stddev, (stddev(SUBSET, True)["uncertainty"] - real_stddev) / real_stddev)
-	
 	# Return the complete distribution
-	if return_distribution:
-		return (frac_stddev_minmax, frac_stddev_exclextr, frac_stddev_percmeas, frac_stddev_middle,  frac_stddev_mad, frac_stddev_iqr, frac_stddev_close68, frac_stddev_stddev)
-	
-	# Only return the mean and standard deviation of these uncertainty measures, as compared to the standard deviation of the whole set.
-	else:
-		return (stddev(frac_stddev_minmax)["mean"], stddev(frac_stddev_minmax)["uncertainty"], stddev(frac_stddev_exclextr)["mean"], stddev(frac_stddev_exclextr)["uncertainty"], stddev(frac_stddev_percmeas)["mean"], stddev(frac_stddev_percmeas)["uncertainty"], stddev(frac_stddev_middle)["mean"], stddev(frac_stddev_middle)["uncertainty"], stddev(frac_stddev_mad)["mean"], stddev(frac_stddev_mad)["uncertainty"], stddev(frac_stddev_iqr)["mean"], stddev(frac_stddev_iqr)["uncertainty"], stddev(frac_stddev_close68)["mean"], stddev(frac_stddev_close68)["uncertainty"], stddev(frac_stddev_stddev)["mean"], stddev(frac_stddev_stddev)["uncertainty"])
+	return tuple(frac_stddev[name] for name in ESTIMATORS)
+
+def deviation_dictionary(SET, no_draws, accumulators, frac_stddev = None):
+	"""Writes the results of the distribution routine to a dictionary: the pre-binned histogram, count, mean and standard deviation of every uncertainty measure from its accumulator under name_hist, name_count, name_mean and name_unc, and, when frac_stddev is given, the deviations themselves under the name of the measure."""
+	deviations = {}
+	for name in ESTIMATORS:
+		if frac_stddev is not None: deviations[name] = frac_stddev[name]
+		deviations[name + "_hist"] = accumulators[name]["hist"]
+		deviations[name + "_count"] = accumulators[name]["count"]
+		deviations[name + "_mean"] = MC_streaming.summary(accumulators[name])["mean"]
+		deviations[name + "_unc"] = MC_streaming.summary(accumulators[name])["uncertainty"]
+	deviations["bin_edges"] = accumulators[ESTIMATORS[0]]["bin_edges"]
+	deviations["SET"] = SET
+	deviations["no_draws"] = no_draws
+	return deviations
+
+def development_dictionary(accumulators):
+	"""Takes a list with, for every subsample size, a dictionary with the accumulator of every uncertainty measure, and writes the mean and standard deviation of every measure to the development dictionary under name_means and name_uncs, one value per subsample size."""
+	development = dict((name + suffix, np.empty(len(accumulators))) for name in ESTIMATORS for suffix in ("_means", "_uncs"))
+	for size_index in range(len(accumulators)):
+		summary = summarize_accumulators(accumulators[size_index])
+		for estimator_index, name in enumerate(ESTIMATORS):
+			development[name + "_means"][size_index] = summary[2 * estimator_index]
+			development[name + "_uncs"][size_index] = summary[2 * estimator_index + 1]
+	return development
+
+def run_metadata(population_seed, sampling_seed, replace, chunk_size, population = None):
+	"""Returns the metadata that describes how the results of a run were calculated. population describes the base set, by default the one of base_set."""
+	if population is None: population = {"distribution" : "normal", "mean" : 100, "sd" : 20, "size" : 1000}
+	return {"population_seed" : population_seed, "population" : population, "sampling_seed" : sampling_seed, "bootstrap" : replace, "chunk_size" : chunk_size, "estimators" : list(ESTIMATORS), "estimator_parameters" : ESTIMATOR_PARAMETERS}
 
 if __name__=="__main__":
 
+	if instrument: MC_instrument.enable(profile, trace_memory)
+
 	# Create the base set and calculate mean and uncertainty.
-	np.random.seed(2)
-	
-	SET = np.random.normal(100,20,1000)
+	SET = base_set(population_seed)
 	real_mean = stddev(SET)["mean"]
-	real_stddev = stddev(SET)["uncertainty"]
+	real_stddev = reference_uncertainty(SET)
+	# Settings of this run, written to the manifest of every result directory
+	metadata = run_metadata(population_seed, sampling_seed, bootstrap, chunk_size)
+	cache = None
+	if cache_dir is not None: cache = MC_cache.ResultCache(cache_dir, cache_max_bytes)
+	cache_description = dict(metadata["population"], seed = population_seed)
 
 	# Routine to calculate the distributions of the uncertainty measures, as compared to the standard deviation of the complete set.
 	if calculate_distributions:
 		# Run the monte carlo simulation
 		no_draws = 10
-		dev_minmax, dev_exclextr, dev_percmeas, dev_middle, dev_mad, dev_iqr, dev_close68, dev_stddev = draw_set(SET, 10000, no_draws, True)
-		# Write the results to a dictionary
-		deviations = {}
-		deviations["minmax"] = dev_minmax
-		deviations["exclextr"] = dev_exclextr
-		deviations["percmeas"] = dev_percmeas
-		deviations["middle"] = dev_middle
-		deviations["mad"] = dev_mad
-		deviations["iqr"] = dev_iqr
-		deviations["close68"] = dev_close68
-		deviations["stddev"] = dev_stddev
-		deviations["SET"] = SET
-		deviations["no_draws"] = no_draws
-		pickle.dump(deviations, open("./App-deviations.p", "wb"))
+		no_repetitions = 10000
+		with MC_instrument.timer("stage/distributions"):
+			if stream_distributions:
+				frac_stddev = None
+				# The convergence is recorded while streaming, at log-spaced checkpoints so its size is bounded as well
+				checkpoints = MC_convergence.log_checkpoints(no_repetitions, convergence_points or 1000) if calculate_convergence else None
+				accumulators = stream_set(SET, no_repetitions, no_draws, chunk_size, seed = sampling_seed, replace = bootstrap, reference_stddev = real_stddev, checkpoints = checkpoints)
+				if calculate_convergence: accumulators, convergence = accumulators
+			elif cache is not None:
+				frac_stddev = MC_cache.cached_draw_set(cache, SET, real_stddev, no_repetitions, no_draws, seed = sampling_seed, workers = sweep_workers, chunk_size = chunk_size, replace = bootstrap, description = cache_description)
+				accumulators = dict((name, MC_streaming.accumulate_chunks(frac_stddev[name], chunk_size)) for name in ESTIMATORS)
+			else:
+				frac_stddev = dict(zip(ESTIMATORS, draw_set(SET, no_repetitions, no_draws, True, chunk_size, seed = sampling_seed, replace = bootstrap, reference_stddev = real_stddev)))
+				accumulators = dict((name, MC_streaming.accumulate_chunks(frac_stddev[name], chunk_size)) for name in ESTIMATORS)
+		# Write the results, with the pre-binned histograms and the moments of every distribution, to a dictionary
+		deviations = deviation_dictionary(SET, no_draws, accumulators, frac_stddev)
+		MC_store.save_results("./App-deviations", deviations, dict(metadata, N = no_draws, repetitions = no_repetitions))
 		print("Deviation dictionary succesfully saved")
 
 		# Routine to calculate how the uncertainty of the set of uncertainties converges with increasing iterations.
 		if calculate_convergence:
-			convergence_minmax = convergence_exclextr = convergence_percmeas = convergence_middle =  convergence_mad = convergence_iqr = convergence_close68 = convergence_stddev = np.array([])
-			for i in range(len(dev_minmax)):
-				convergence_minmax = np.append(convergence_minmax, stddev(dev_minmax[:i+1],False)["mean"])
-				convergence_exclextr = np.append(convergence_exclextr, stddev(dev_exclextr[:i+1],False)["mean"])
-				convergence_percmeas = np.append(convergence_percmeas, stddev(dev_percmeas[:i+1],False)["mean"])
-				convergence_middle = np.append(convergence_middle, stddev(dev_middle[:i+1],False)["mean"])
-				convergence_mad = np.append(convergence_mad, stddev(dev_mad[:i+1],False)["mean"])
-				convergence_iqr = np.append(convergence_iqr, stddev(dev_iqr[:i+1],False)["mean"])
-				convergence_close68 = np.append(convergence_close68, stddev(dev_close68[:i+1],False)["mean"])
-				convergence_stddev = np.append(convergence_stddev, stddev(dev_stddev[:i+1],False)["mean"])
-			
-			# Write the whole thing to a dictionary
-			convergence = {}
-			convergence["minmax"] = convergence_minmax
-			convergence["exclextr"] = convergence_exclextr
-			convergence["percmeas"] = convergence_percmeas
-			convergence["middle"] = convergence_middle
-			convergence["mad"] = convergence_mad
-			convergence["iqr"] = convergence_iqr
-			convergence["close68"] = convergence_close68
-			convergence["stddev"] = convergence_stddev
+			if not stream_distributions:
+				checkpoints = None
+				if convergence_points is not None: checkpoints = MC_convergence.log_checkpoints(no_repetitions, convergence_points)
+				# Calculate the running mean, standard deviation and standard error of every uncertainty measure in a single pass and write it to a dictionary
+				with MC_instrument.timer("stage/convergence"):
+					convergence = MC_convergence.convergence_curves(deviations, ESTIMATORS, checkpoints)
 			convergence["no_draws"] = no_draws
-			pickle.dump(convergence, open("./App-convergence.p", "wb"))
+			MC_store.save_results("./App-convergence", convergence, dict(metadata, N = no_draws, repetitions = no_repetitions))
 			print("Convergence dictionaries saved")
+		elif os.path.isdir("./App-convergence"):
+			# Remove the convergence of an earlier run, so it is not plotted together with these distributions
+			shutil.rmtree("./App-convergence")
 
 	# Routine to calculate how the distributions of uncertainties develops with different number of draws.
 	if calculate_sample_size_distributions:
-		# Make empty numpy arrays
-		minmax_means = minmax_uncs = exclextr_means = exclextr_uncs = percmeas_means = percmeas_uncs = middle_means = middle_uncs = mad_means = mad_uncs = iqr_means = iqr_uncs = close68_means = close68_uncs = stddev_means = stddev_uncs = np.array([])
-
 		min_size_of_sample = 4
 		max_size_of_sample = 21
 
-		# Execute the draw_set function for different SUBSAMPLE sizes. They will range from min_size_of_sample to max_size_of_sample.
-		for no_measurements in range(min_size_of_sample,max_size_of_sample):
-			minmax_mean, minmax_unc, exclextr_mean, exclextr_unc, percmeas_mean, percmeas_unc, middle_mean, middle_unc, mad_mean, mad_unc, iqr_mean, iqr_unc, close68_mean, close68_unc, stddev_mean, stddev_unc = draw_set(SET, 10000, no_measurements, False)
-			minmax_means = np.append(minmax_means, minmax_mean)
-			minmax_uncs = np.append(minmax_uncs, minmax_unc)
-			percmeas_means = np.append(percmeas_means, percmeas_mean)
-			percmeas_uncs = np.append(percmeas_uncs, percmeas_unc)
-			exclextr_means = np.append(exclextr_means, exclextr_mean)
-			exclextr_uncs = np.append(exclextr_uncs, exclextr_unc)
-			middle_means = np.append(middle_means, middle_mean)
-			middle_uncs = np.append(middle_uncs, middle_unc)
-			mad_means = np.append(mad_means, mad_mean)
-			mad_uncs = np.append(mad_uncs, mad_unc)
-			iqr_means = np.append(iqr_means, iqr_mean)
-			iqr_uncs = np.append(iqr_uncs, iqr_unc)
-			close68_means = np.append(close68_means, close68_mean)
-			close68_uncs = np.append(close68_uncs, close68_unc)
-			stddev_means = np.append(stddev_means, stddev_mean)
-			stddev_uncs = np.append(stddev_uncs, stddev_unc)
-
-		# Write the whole thing to a dictionary
-		development = {}
-		development["minmax_means"] = minmax_means
-		development["minmax_uncs"] = minmax_uncs
-		development["percmeas_means"] = percmeas_means
-		development["percmeas_uncs"] = percmeas_uncs
-		development["exclextr_means"] = exclextr_means
-		development["exclextr_uncs"] = exclextr_uncs
-		development["middle_means"] = middle_means
-		development["middle_uncs"] = middle_uncs
-		development["mad_means"] = mad_means
-		development["mad_uncs"] = mad_uncs
-		development["iqr_means"] = iqr_means
-		development["iqr_uncs"] = iqr_uncs
-		development["close68_means"] = close68_means
-		development["close68_uncs"] = close68_uncs
-		development["stddev_means"] = stddev_means
-		development["stddev_uncs"] = stddev_uncs
-		pickle.dump(development, open("./App-development.p", "wb"))
+		with MC_instrument.timer("stage/development"):
+			if adaptive_tolerance is None and cache is not None:
+				# Only calculate the (N, chunk) tasks that are not in the cache yet
+				development = MC_cache.cached_sample_size_sweep(cache, SET, real_stddev, range(min_size_of_sample,max_size_of_sample), 10000, seed = sampling_seed, workers = sweep_workers, chunk_size = chunk_size, replace = bootstrap, description = cache_description)
+			elif adaptive_tolerance is None:
+				# Execute draw_set for different SUBSAMPLE sizes, spread over sweep_workers processes. They will range from min_size_of_sample to max_size_of_sample.
+				# The (N, chunk) tasks are reduced in a fixed order, so the development dictionary does not depend on the number of workers.
+				development = MC_parallel.sample_size_sweep(SET, real_stddev, range(min_size_of_sample,max_size_of_sample), 10000, seed = sampling_seed, workers = sweep_workers, chunk_size = chunk_size, replace = bootstrap)
+			else:
+				# Repeat every (N, measure) cell until its mean deviation is known to within adaptive_tolerance
+				development = MC_adaptive.adaptive_sweep(SET, real_stddev, range(min_size_of_sample,max_size_of_sample), adaptive_tolerance, adaptive_max_repetitions, adaptive_min_repetitions, chunk_size = adaptive_batch_size, seed = sampling_seed, workers = sweep_workers, replace = bootstrap)
+				print(MC_adaptive.repetition_report(development, range(min_size_of_sample,max_size_of_sample)))
+		MC_store.save_results("./App-development", development, dict(metadata, N = list(range(min_size_of_sample,max_size_of_sample)), repetitions = 10000 if adaptive_tolerance is None else dict((name, development[name + "_repetitions"].tolist()) for name in ESTIMATORS), adaptive_tolerance = adaptive_tolerance))
 		print("Development dictionary succesfully saved")
+
+	if instrument:
+		MC_instrument.write_report("./App-timing.json")
+		MC_instrument.disable()
+		print("Timing report saved to App-timing.json")
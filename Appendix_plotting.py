@@ -1,50 +1,33 @@
 #!/usr/bin/python
 #################
-# Run after having run Appendix-MC_calculation.py 
-# This script creates several plots showing the development 
-# of the deviation of the different uncertainty measures. 
+# Run after having run Appendix-MC_calculation.py
+# This script creates several plots showing the development
+# of the deviation of the different uncertainty measures.
+# The histograms are drawn from the pre-binned counts and the convergence curves are reduced
+# to at most --max-points points, so the plotting time does not grow with the number of
+# repetitions. With --output-dir, the figures are rendered without a display and saved to
+# files, optionally in parallel with --workers.
 # Date: Sept 25 2020
 # By: Karel Kok
+#
+# Usage:
+#   python Appendix_plotting.py [--output-dir figures] [--format png] [--workers 4] [--max-points 2000]
 
+import argparse
+import os
 import numpy as np
 import matplotlib.pyplot as plt
-import pickle
-import Appendix_MC_calculation as MC_calc
-from scipy import stats
-
-deviations = pickle.load(open("./App-deviations.p", "rb"))
-convergence = pickle.load(open("./App-convergence.p", "rb"))
-development = pickle.load(open("./App-development.p", "rb"))
+from concurrent.futures import ProcessPoolExecutor
+import MC_convergence
+import MC_streaming
+import MC_store
 
+RESULT_DIRECTORIES = {"deviations" : "./App-deviations", "convergence" : "./App-convergence", "development" : "./App-development"}
 
 font = {'size'   : 13}
 
 plt.rc('font', **font)
 
-
-# Print mean and uncertainty of the different uncertainty measures as shown in the distribution plot
-print ("              Mean SDOM SD   SD(10)")
-print ("Min-max:      "+str(round(MC_calc.stddev(deviations["minmax"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["minmax"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+" "+str(round(MC_calc.stddev(deviations["minmax"])["uncertainty"],2))+" "+str(round(development["minmax_uncs"][8],2)))
-print ("Excl. Extr.: "+str(round(MC_calc.stddev(deviations["exclextr"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["exclextr"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+" "+str(round(MC_calc.stddev(deviations["exclextr"])["uncertainty"],2))+" "+str(round(development["exclextr_uncs"][8],2)))
-print ("Middle 50%:  "+str(round(MC_calc.stddev(deviations["middle"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["middle"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+" "+str(round(MC_calc.stddev(deviations["middle"])["uncertainty"],2))+" "+str(round(development["middle_uncs"][8],2)))
-print ("MAD:         "+str(round(MC_calc.stddev(deviations["mad"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["mad"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+" "+str(round(MC_calc.stddev(deviations["mad"])["uncertainty"],2))+" "+str(round(development["mad_uncs"][8],2)))
-# print ("IQR:         "+str(round(MC_calc.stddev(deviations["iqr"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["iqr"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+" "+str(round(MC_calc.stddev(deviations["iqr"])["uncertainty"],2))+" "+str(round(development["iqr_uncs"][8],2)))
-print ("Std. Dev.:   "+str(round(MC_calc.stddev(deviations["stddev"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["stddev"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+"  "+str(round(MC_calc.stddev(deviations["stddev"])["uncertainty"],2))+" "+str(round(development["stddev_uncs"][8],2)))
-print ("68% meas.:   "+str(round(MC_calc.stddev(deviations["close68"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["close68"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+"  "+str(round(MC_calc.stddev(deviations["close68"])["uncertainty"],2))+" "+str(round(development["close68_uncs"][8],2)))
-print ("Percentage:  "+str(round(MC_calc.stddev(deviations["percmeas"])["mean"],2))+" "+str(round(MC_calc.stddev(deviations["percmeas"])["uncertainty"]/np.sqrt(deviations["no_draws"]),2))+" "+str(round(MC_calc.stddev(deviations["percmeas"])["uncertainty"],2))+" "+str(round(development["percmeas_uncs"][8],2)))
-
-
-print ("\nRange of uncertainties")
-print ("Min-Max:   "+str(round(min(development["minmax_uncs"]) ,2))+" - "+str(round(max(development["minmax_uncs"]) ,2)))
-print ("Excl.Extr: "+str(round(min(development["exclextr_uncs"]) ,2))+" - "+str(round(max(development["exclextr_uncs"]) ,2)))
-print ("Middle 50: "+str(round(min(development["middle_uncs"]) ,2))+" - "+str(round(max(development["middle_uncs"]) ,2)))
-print ("MAD:       "+str(round(min(development["mad_uncs"]) ,2))+" - "+str(round(max(development["mad_uncs"]) ,2)))
-print ("Std.Dev.:  "+str(round(min(development["stddev_uncs"]) ,2))+" - "+str(round(max(development["stddev_uncs"]) ,2)))
-print ("Close68:   "+str(round(min(development["close68_uncs"]) ,2))+" - "+str(round(max(development["minmax_uncs"]) ,2)))
-print ("Percent:   "+str(round(min(development["percmeas_uncs"]) ,2))+" - "+str(round(max(development["minmax_uncs"]) ,2)))
-min_size_of_sample = 4
-max_size_of_sample = 21
-
 linestyle_dict = {
 	"solid" : "-",
 	"dashed" : 	"--",
@@ -53,76 +36,178 @@ linestyle_dict = {
 	"dotted" : (0,(1,1))
 }
 
-fig2 = plt.figure(3)
-plt.plot(range(2, len(convergence["minmax"])+2), convergence["minmax"], label = "Min-max", linewidth = 1.7, ls = linestyle_dict["solid"])
-plt.plot(range(2, len(convergence["exclextr"])+2), convergence["exclextr"], label = "Exclude extremes", linewidth = 1.7, ls = linestyle_dict["dashed"])
-# plt.plot(range(2, len(convergence["percmeas"])+2), convergence["percmeas"], label = "Central 50%")
-plt.plot(range(2, len(convergence["middle"])+2), convergence["middle"], label = "Middle 50%", linewidth = 1.7, ls = linestyle_dict["dashdotted"])
-plt.plot(range(2, len(convergence["mad"])+2), convergence["mad"], label = "MAD", linewidth = 1.7, ls = linestyle_dict["dashdashdotted"])
-# plt.plot(range(2, len(convergence["iqr"])+2), convergence["iqr"], label = "IQR")
-plt.plot(range(2, len(convergence["stddev"])+2), convergence["stddev"], label = "Standard deviation", linewidth = 1.7, ls = linestyle_dict["dotted"])
-# plt.title("Convergence of uncertainty measures, based un subsets of 8 measurements")
-plt.xlabel("Number of repetitions")
-plt.ylabel(r"Mean uncertainty deviation $\Delta$")
-plt.legend(loc = 1, handlelength=3.5)
-plt.tight_layout()
-
-fig1 = plt.figure(1)
-plt.hist(deviations["minmax"], 50, alpha = .4, label = "Min-max")
-plt.hist(deviations["exclextr"], 50, alpha = .4, label = "Exclude extremes")
-plt.hist(deviations["middle"], 50, alpha = .4, label = "Middle 50%")
-plt.hist(deviations["mad"], 50, alpha = .4, label = "MAD")
-# plt.hist(deviations["iqr"], 50, alpha = .4, label = "IQR")
-plt.hist(deviations["stddev"], 50, alpha = .4, label = "Standard deviation")
-plt.axvline(x=0., color = "black")
-# plt.title(r"$10^4$ repetitions with subsets of 8 measurements")
-plt.xlabel(r"Uncertainty deviation $\Delta$")
-plt.ylabel(r"Counts")
-plt.legend()
-plt.tight_layout()
-
-fig3 = plt.figure(2)
-plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["minmax_means"] - development["minmax_uncs"], development["minmax_means"] + development["minmax_uncs"], alpha = .2)
-plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["exclextr_means"] - development["exclextr_uncs"], development["exclextr_means"] + development["exclextr_uncs"], alpha = .2)
-plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["middle_means"] - development["middle_uncs"], development["middle_means"] + development["middle_uncs"], alpha = .2)
-plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["mad_means"] - development["mad_uncs"], development["mad_means"] + development["mad_uncs"], alpha = .2)
-plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["stddev_means"] - development["stddev_uncs"], development["stddev_means"] + development["stddev_uncs"], alpha = .2)
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["minmax_means"], linewidth = 1.7, label = "Min-max", ls = linestyle_dict["solid"])
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["exclextr_means"], linewidth = 1.7, label = "Exclude extremes", ls = linestyle_dict["dashed"])
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["middle_means"], linewidth = 1.7, label = "Middle 50%", ls = linestyle_dict["dashdotted"])
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["mad_means"], linewidth = 1.7, label = "MAD", ls = linestyle_dict["dashdashdotted"])
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["stddev_means"], linewidth = 1.7, label = "Standard deviation", ls = linestyle_dict["dotted"])
-plt.axhline(y=0., color = "black")
-plt.xlabel(r"Number of measurements per subsample $N$")
-plt.ylabel(r"Uncertainty deviation $\Delta$ ")
-plt.ylim(-0.9, 1.8)
-# plt.title(r"""Development of average uncertainty as a function of the number of draws
-# Based on 10$^4$ repetitions.
-# Highlighted regions indicate standard deviation of single subsamples.""")
-plt.legend(handlelength=3.5)
-plt.tight_layout()
-
-
-fig4 = plt.figure(4)
-plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["middle_means"] - development["middle_uncs"], development["middle_means"] + development["middle_uncs"], alpha = .2, color = "C2")
-# plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["percmeas_means"] - development["percmeas_uncs"], development["percmeas_means"] + development["percmeas_uncs"], alpha = .2, color = "C5")
-# plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["close68_means"] - development["close68_uncs"], development["close68_means"] + development["close68_uncs"], alpha = .2, color = "C9")
-# plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["iqr_means"] - development["iqr_uncs"], development["iqr_means"] + development["iqr_uncs"], alpha = .2, color="C1")
-# plt.fill_between(range(min_size_of_sample,max_size_of_sample), development["stddev_means"] - development["stddev_uncs"], development["stddev_means"] + development["stddev_uncs"], alpha = .2, color = "C4")
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["middle_means"], linewidth = 1.7, label = "Middle 50%", ls = linestyle_dict["solid"], color = "C2")
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["close68_means"], linewidth = 1.7, label = "68% of measurements", ls = linestyle_dict["dashed"], color = "C9")
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["percmeas_means"], linewidth = 1.7, label = "76% of measurements", ls = linestyle_dict["dashdotted"], color = "C5")
-plt.plot(range(min_size_of_sample,max_size_of_sample), development["iqr_means"], linewidth = 1.7, label = "IQR", ls = linestyle_dict["dotted"], color="C1")
-# plt.plot(range(min_size_of_sample,max_size_of_sample), development["stddev_means"], linewidth = 1.7, label = "Standard deviation", ls = linestyle_dict["dotted"], color = "C4")
-plt.axhline(y=0., color = "black")
-plt.xlabel(r"Number of measurements per subsample $N$")
-plt.ylabel(r"Uncertainty deviation $\Delta$")
-plt.ylim(-0.9, 1.8)
-# plt.title(r"""Development of average uncertainty as a function of the number of draws
-# Based on 10$^4$ repetitions.
-# Highlighted regions indicate standard deviation of single subsamples.""")
-plt.legend(handlelength=3.5)
-plt.tight_layout()
-
-
-plt.show()
\ No newline at end of file
+def load_all():
+	"""Loads the result directories of Appendix_MC_calculation.py. The results are memory-mapped, and only the columns that are used are read. The convergence directory is optional, as it is not written when calculate_convergence is false."""
+	return dict((name, MC_store.load_results(path)) for name, path in RESULT_DIRECTORIES.items() if name != "convergence" or os.path.exists(os.path.join(path, MC_store.MANIFEST)))
+
+def available_figures(results):
+	"""Returns the names of the figures in FIGURES whose results were loaded."""
+	return [name for name in FIGURES if name != "convergence" or "convergence" in results]
+
+def summary_statistics(results, names):
+	"""Calculates, once for every uncertainty measure in names, the mean deviation, the standard error of the mean (SDOM), the standard deviation (SD), the standard deviation of the sample size sweep at the N of the distributions (SD(N), NaN when the sweep does not include this N) and the range of the standard deviation over the sweep."""
+	deviations, development = results["deviations"], results["development"]
+	sizes = list(development.metadata["N"])
+	summary = {}
+	for name in names:
+		uncs = np.asarray(development[name + "_uncs"])
+		sd_sweep = uncs[sizes.index(deviations["no_draws"])] if deviations["no_draws"] in sizes else np.nan
+		summary[name] = {"mean" : deviations[name + "_mean"], "sdom" : deviations[name + "_unc"]/np.sqrt(deviations["no_draws"]), "sd" : deviations[name + "_unc"], "sd_sweep" : sd_sweep, "min" : uncs.min(), "max" : uncs.max()}
+	return summary
+
+def print_summary(results):
+	"""Prints the mean and uncertainty of the different uncertainty measures as shown in the distribution plot, and the range of their uncertainties."""
+	table = [("minmax", "Min-max:     "), ("exclextr", "Excl. Extr.: "), ("middle", "Middle 50%:  "), ("mad", "MAD:         "), ("stddev", "Std. Dev.:   "), ("close68", "68% meas.:   "), ("percmeas", "Percentage:  ")]
+	ranges = [("minmax", "Min-Max:   "), ("exclextr", "Excl.Extr: "), ("middle", "Middle 50: "), ("mad", "MAD:       "), ("stddev", "Std.Dev.:  "), ("close68", "Close68:   "), ("percmeas", "Percent:   ")]
+	summary = summary_statistics(results, [name for name, label in table])
+	print ("              Mean SDOM SD   SD("+str(results["deviations"]["no_draws"])+")")
+	for name, label in table:
+		print (label+" ".join(str(round(summary[name][key],2)) for key in ("mean", "sdom", "sd", "sd_sweep")))
+	print ("\nRange of uncertainties")
+	for name, label in ranges:
+		print (label+str(round(summary[name]["min"] ,2))+" - "+str(round(summary[name]["max"] ,2)))
+
+def plot_histogram(deviations, name, no_bins, **kwargs):
+	"""Plots the pre-binned histogram of the deviations of an uncertainty measure, with at most no_bins bins."""
+	counts, bin_edges = MC_streaming.rebin({"hist" : deviations[name + "_hist"], "bin_edges" : deviations["bin_edges"]}, no_bins)
+	return plt.hist(bin_edges[:-1], bin_edges, weights = counts, **kwargs)
+
+def plot_convergence_curve(convergence, name, max_points, **kwargs):
+	"""Plots the running mean deviation of an uncertainty measure, reduced to at most max_points points."""
+	repetitions = np.asarray(convergence["repetitions"])
+	curve = np.asarray(convergence[name])
+	selected = MC_convergence.lttb_indices(repetitions, curve, max_points)
+	return plt.plot(repetitions[selected], curve[selected], **kwargs)
+
+def figure_convergence(results, max_points):
+	convergence = results["convergence"]
+	fig2 = plt.figure(3)
+	plot_convergence_curve(convergence, "minmax", max_points, label = "Min-max", linewidth = 1.7, ls = linestyle_dict["solid"])
+	plot_convergence_curve(convergence, "exclextr", max_points, label = "Exclude extremes", linewidth = 1.7, ls = linestyle_dict["dashed"])
+	# plot_convergence_curve(convergence, "percmeas", max_points, label = "Central 50%")
+	plot_convergence_curve(convergence, "middle", max_points, label = "Middle 50%", linewidth = 1.7, ls = linestyle_dict["dashdotted"])
+	plot_convergence_curve(convergence, "mad", max_points, label = "MAD", linewidth = 1.7, ls = linestyle_dict["dashdashdotted"])
+	# plot_convergence_curve(convergence, "iqr", max_points, label = "IQR")
+	plot_convergence_curve(convergence, "stddev", max_points, label = "Standard deviation", linewidth = 1.7, ls = linestyle_dict["dotted"])
+	# plt.title("Convergence of uncertainty measures, based un subsets of 8 measurements")
+	plt.xlabel("Number of repetitions")
+	plt.ylabel(r"Mean uncertainty deviation $\Delta$")
+	plt.legend(loc = 1, handlelength=3.5)
+	plt.tight_layout()
+	return fig2
+
+def figure_distributions(results, max_points):
+	deviations = results["deviations"]
+	fig1 = plt.figure(1)
+	plot_histogram(deviations, "minmax", 50, alpha = .4, label = "Min-max")
+	plot_histogram(deviations, "exclextr", 50, alpha = .4, label = "Exclude extremes")
+	plot_histogram(deviations, "middle", 50, alpha = .4, label = "Middle 50%")
+	plot_histogram(deviations, "mad", 50, alpha = .4, label = "MAD")
+	# plot_histogram(deviations, "iqr", 50, alpha = .4, label = "IQR")
+	plot_histogram(deviations, "stddev", 50, alpha = .4, label = "Standard deviation")
+	plt.axvline(x=0., color = "black")
+	# plt.title(r"$10^4$ repetitions with subsets of 8 measurements")
+	plt.xlabel(r"Uncertainty deviation $\Delta$")
+	plt.ylabel(r"Counts")
+	plt.legend()
+	plt.tight_layout()
+	return fig1
+
+def figure_development(results, max_points):
+	development = results["development"]
+	# The subsample sizes of the sweep are recorded in the manifest of the development results
+	sizes = development.metadata["N"]
+	fig3 = plt.figure(2)
+	plt.fill_between(sizes, development["minmax_means"] - development["minmax_uncs"], development["minmax_means"] + development["minmax_uncs"], alpha = .2)
+	plt.fill_between(sizes, development["exclextr_means"] - development["exclextr_uncs"], development["exclextr_means"] + development["exclextr_uncs"], alpha = .2)
+	plt.fill_between(sizes, development["middle_means"] - development["middle_uncs"], development["middle_means"] + development["middle_uncs"], alpha = .2)
+	plt.fill_between(sizes, development["mad_means"] - development["mad_uncs"], development["mad_means"] + development["mad_uncs"], alpha = .2)
+	plt.fill_between(sizes, development["stddev_means"] - development["stddev_uncs"], development["stddev_means"] + development["stddev_uncs"], alpha = .2)
+	plt.plot(sizes, development["minmax_means"], linewidth = 1.7, label = "Min-max", ls = linestyle_dict["solid"])
+	plt.plot(sizes, development["exclextr_means"], linewidth = 1.7, label = "Exclude extremes", ls = linestyle_dict["dashed"])
+	plt.plot(sizes, development["middle_means"], linewidth = 1.7, label = "Middle 50%", ls = linestyle_dict["dashdotted"])
+	plt.plot(sizes, development["mad_means"], linewidth = 1.7, label = "MAD", ls = linestyle_dict["dashdashdotted"])
+	plt.plot(sizes, development["stddev_means"], linewidth = 1.7, label = "Standard deviation", ls = linestyle_dict["dotted"])
+	plt.axhline(y=0., color = "black")
+	plt.xlabel(r"Number of measurements per subsample $N$")
+	plt.ylabel(r"Uncertainty deviation $\Delta$ ")
+	plt.ylim(-0.9, 1.8)
+	# plt.title(r"""Development of average uncertainty as a function of the number of draws
+	# Based on 10$^4$ repetitions.
+	# Highlighted regions indicate standard deviation of single subsamples.""")
+	plt.legend(handlelength=3.5)
+	plt.tight_layout()
+	return fig3
+
+def figure_development_fractions(results, max_points):
+	development = results["development"]
+	sizes = development.metadata["N"]
+	fig4 = plt.figure(4)
+	plt.fill_between(sizes, development["middle_means"] - development["middle_uncs"], development["middle_means"] + development["middle_uncs"], alpha = .2, color = "C2")
+	# plt.fill_between(sizes, development["percmeas_means"] - development["percmeas_uncs"], development["percmeas_means"] + development["percmeas_uncs"], alpha = .2, color = "C5")
+	# plt.fill_between(sizes, development["close68_means"] - development["close68_uncs"], development["close68_means"] + development["close68_uncs"], alpha = .2, color = "C9")
+	# plt.fill_between(sizes, development["iqr_means"] - development["iqr_uncs"], development["iqr_means"] + development["iqr_uncs"], alpha = .2, color="C1")
+	# plt.fill_between(sizes, development["stddev_means"] - development["stddev_uncs"], development["stddev_means"] + development["stddev_uncs"], alpha = .2, color = "C4")
+	plt.plot(sizes, development["middle_means"], linewidth = 1.7, label = "Middle 50%", ls = linestyle_dict["solid"], color = "C2")
+	plt.plot(sizes, development["close68_means"], linewidth = 1.7, label = "68% of measurements", ls = linestyle_dict["dashed"], color = "C9")
+	plt.plot(sizes, development["percmeas_means"], linewidth = 1.7, label = "76% of measurements", ls = linestyle_dict["dashdotted"], color = "C5")
+	plt.plot(sizes, development["iqr_means"], linewidth = 1.7, label = "IQR", ls = linestyle_dict["dotted"], color="C1")
+	# plt.plot(sizes, development["stddev_means"], linewidth = 1.7, label = "Standard deviation", ls = linestyle_dict["dotted"], color = "C4")
+	plt.axhline(y=0., color = "black")
+	plt.xlabel(r"Number of measurements per subsample $N$")
+	plt.ylabel(r"Uncertainty deviation $\Delta$")
+	plt.ylim(-0.9, 1.8)
+	# plt.title(r"""Development of average uncertainty as a function of the number of draws
+	# Based on 10$^4$ repetitions.
+	# Highlighted regions indicate standard deviation of single subsamples.""")
+	plt.legend(handlelength=3.5)
+	plt.tight_layout()
+	return fig4
+
+# The figures in the order in which they are drawn, with the name of their file
+FIGURES = {
+	"convergence" : figure_convergence,
+	"distributions" : figure_distributions,
+	"development" : figure_development,
+	"development_fractions" : figure_development_fractions,
+}
+
+def render_figure(name, output_dir, file_format = "png", max_points = 2000):
+	"""Draws the figure name without a display and saves it to output_dir. The results are loaded again, so that the figures can be rendered in separate processes. The function returns the name of the file."""
+	plt.switch_backend("Agg")
+	figure = FIGURES[name](load_all(), max_points)
+	path = os.path.join(output_dir, name + "." + file_format)
+	figure.savefig(path)
+	plt.close(figure)
+	return path
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Plot the results of Appendix_MC_calculation.py.")
+	parser.add_argument("--output-dir", default = None, help = "save the figures to this directory without showing them")
+	parser.add_argument("--format", default = "png", help = "file format of the saved figures")
+	parser.add_argument("--workers", type = int, default = 1, help = "number of processes that render the saved figures")
+	parser.add_argument("--max-points", type = int, default = 2000, help = "largest number of points of a convergence curve")
+	arguments = parser.parse_args(arguments)
+
+	results = load_all()
+	print_summary(results)
+
+	figures = available_figures(results)
+	if "convergence" not in figures: print("No convergence results found, the convergence figure is skipped")
+
+	if arguments.output_dir is None:
+		for name in figures:
+			FIGURES[name](results, arguments.max_points)
+		plt.show()
+		return
+
+	os.makedirs(arguments.output_dir, exist_ok = True)
+	if arguments.workers == 1:
+		paths = [render_figure(name, arguments.output_dir, arguments.format, arguments.max_points) for name in figures]
+	else:
+		with ProcessPoolExecutor(max_workers = arguments.workers) as executor:
+			paths = list(executor.map(render_figure, figures, [arguments.output_dir] * len(figures), [arguments.format] * len(figures), [arguments.max_points] * len(figures)))
+	print("Figures succesfully saved to " + ", ".join(paths))
+
+if __name__=="__main__":
+	main()
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+#################
+# Adaptive version of the sample size sweep of Appendix_MC_calculation.py.
+# Instead of a fixed number of repetitions, the subsamples are drawn in chunks and every
+# (N, uncertainty measure) cell stops as soon as the standard error of its mean deviation
+# is below a tolerance, or when it reaches the maximum number of repetitions. Measures that
+# have stopped are no longer evaluated for the following chunks of the same N. The chunks
+# are small (1000 repetitions by default), so a cell can stop well before the 10000
+# repetitions of the fixed sweep. With a chunk size equal to that of the fixed sweep, the
+# chunks use the same seed streams, and a cell that runs the same number of repetitions
+# gives the same result as the fixed sweep.
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import Appendix_MC_calculation as MC_calc
+import MC_sampling
+import MC_streaming
+import MC_instrument
+
+def standard_error(accumulator):
+	"""Returns the standard error of the mean of the deviations in an accumulator, or infinity when it holds less than two deviations."""
+	if accumulator["count"] < 2:
+		return np.inf
+	return MC_streaming.summary(accumulator)["uncertainty"] / np.sqrt(accumulator["count"])
+
+def adaptive_cell(population, reference_stddev, no_draws, tolerance, max_iterations, min_iterations = 1000, chunk_size = 10000, seed = None, replace = False):
+	"""Runs chunks of chunk_size subsamples of no_draws items until, for every uncertainty measure, the standard error of its mean deviation is below tolerance (after at least min_iterations repetitions), or max_iterations repetitions are reached. The function returns a dictionary with the accumulator of every uncertainty measure."""
+	seed = MC_sampling.as_seed_sequence(seed)
+	accumulators = dict((name, MC_streaming.new_accumulator()) for name in MC_calc.ESTIMATORS)
+	active = list(MC_calc.ESTIMATORS)
+	chunk_index = 0
+	while active and chunk_index * chunk_size < max_iterations:
+		chunk = MC_calc.accumulator_chunk(population, reference_stddev, no_draws, chunk_index, chunk_size, max_iterations, seed, replace, active, stream = "development")
+		for name in active:
+			accumulators[name] = MC_streaming.merge(accumulators[name], chunk[name])
+		active = [name for name in active if accumulators[name]["count"] < min_iterations or standard_error(accumulators[name]) >= tolerance]
+		chunk_index += 1
+	return accumulators
+
+def _run_cell(arguments):
+	"""Runs adaptive_cell in a worker process."""
+	return adaptive_cell(*arguments)
+
+def _run_instrumented_cell(arguments):
+	"""Runs adaptive_cell in a worker process with the instrumentation switched on, and returns its result together with the timers and counters it recorded."""
+	MC_instrument.enable()
+	MC_instrument.reset()
+	return adaptive_cell(*arguments), MC_instrument.snapshot()
+
+def adaptive_sweep(SET, reference_stddev, sizes, tolerance, max_iterations, min_iterations = 1000, chunk_size = 10000, seed = None, workers = None, replace = False):
+	"""Runs adaptive_cell for every subsample size in sizes, spread over a pool of workers processes (all cores when workers is None, in this process when workers is 1). The function returns the development dictionary, with the mean and standard deviation of the deviations of every uncertainty measure under name_means and name_uncs, the standard error of the mean under name_sems and the number of repetitions that was used under name_repetitions."""
+	population = MC_sampling.prepare_population(SET)
+	seed = MC_sampling.as_seed_sequence(seed)
+	cells = [(population, reference_stddev, no_draws, tolerance, max_iterations, min_iterations, chunk_size, seed, replace) for no_draws in sizes]
+	if workers == 1:
+		accumulators = [_run_cell(cell) for cell in cells]
+	else:
+		with ProcessPoolExecutor(max_workers = workers) as executor:
+			if MC_instrument.enabled:
+				accumulators = []
+				for accumulator, snapshot in executor.map(_run_instrumented_cell, cells):
+					MC_instrument.merge_snapshot(snapshot)
+					accumulators.append(accumulator)
+			else:
+				accumulators = list(executor.map(_run_cell, cells))
+
+	development = MC_calc.development_dictionary(accumulators)
+	for name in MC_calc.ESTIMATORS:
+		development[name + "_sems"] = np.array([standard_error(cell[name]) for cell in accumulators])
+		development[name + "_repetitions"] = np.array([cell[name]["count"] for cell in accumulators])
+	return development
+
+def repetition_report(development, sizes):
+	"""Returns a table with the number of repetitions every (N, uncertainty measure) cell has used, as a string."""
+	lines = ["N    " + " ".join("%9s" % name for name in MC_calc.ESTIMATORS)]
+	for size_index, no_draws in enumerate(sizes):
+		lines.append("%-4d " % no_draws + " ".join("%9d" % development[name + "_repetitions"][size_index] for name in MC_calc.ESTIMATORS))
+	total = sum(development[name + "_repetitions"].sum() for name in MC_calc.ESTIMATORS)
+	lines.append("Total number of evaluations: " + str(total))
+	return "\n".join(lines)
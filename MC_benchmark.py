@@ -0,0 +1,182 @@
+#!/usr/bin/python
+#################
+# Benchmarks of the uncertainty measures and of the Monte-Carlo pipeline.
+# For every uncertainty measure and subsample size N, the scalar function (one subsample per
+# call) and the batched function (one subsample per row) are timed, and reported in
+# subsamples per second. The drawing of subsamples is timed for both sampling methods over a
+# range of population and subsample sizes, which shows where MC_sampling switches between
+# them. The three stages of Appendix_MC_calculation.py (distributions, convergence and
+# sample size sweep) are timed end-to-end as the median of several runs, and their peak memory
+# use is measured in a separate run with tracemalloc. The results are written to a JSON
+# file, and can be compared to an earlier run to find regressions. Every measurement lasts at
+# least 0.2 s (repeating short calls), and the median of several passes over all benchmarks is
+# reported, so a temporarily slow machine does not show up as a regression.
+#
+# Usage:
+#   python MC_benchmark.py [--quick] [--output bench.json] [--compare baseline.json] [--threshold 0.2]
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_convergence
+import MC_parallel
+import MC_sampling
+
+SCALAR_FUNCTIONS = {
+	"minmax" : MC_calc.minmax,
+	"exclextr" : MC_calc.exclextr,
+	"percmeas" : MC_calc.percmeas,
+	"middle" : MC_calc.middle,
+	"mad" : MC_calc.mad,
+	"iqr" : MC_calc.iqr,
+	"close68" : MC_calc.close68,
+	"stddev" : MC_calc.stddev,
+}
+
+def median_times(functions, repeats, minimum_time = 0.2):
+	"""Takes a dictionary of functions and returns a dictionary with the median wall time of one call of every function, in seconds. Like timeit, the number of calls per measurement is increased until a measurement takes at least minimum_time seconds. The repeats measurements are taken in passes over all functions, so a slow period of the machine affects one measurement of many functions, which the median removes, instead of all measurements of a few functions."""
+	timers, numbers, times = {}, {}, {}
+	for key, function in functions.items():
+		timers[key] = timeit.Timer(function)
+		numbers[key], elapsed = timers[key].autorange()
+		while elapsed < minimum_time:
+			numbers[key] *= 2
+			elapsed = timers[key].timeit(numbers[key])
+		times[key] = []
+	for repeat in range(repeats):
+		for key, timer in timers.items():
+			times[key].append(timer.timeit(numbers[key]) / numbers[key])
+	return dict((key, float(np.median(times[key]))) for key in functions)
+
+def peak_memory(function):
+	"""Calls function once with tracemalloc running and returns its peak memory use in bytes. The tracing slows the call down, so it is timed separately with median_times."""
+	tracemalloc.start()
+	function()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return peak
+
+def benchmark_estimators(sizes, scalar_rows, batch_rows, repeats):
+	"""Times every uncertainty measure for every subsample size, in scalar and in batched form. The function returns a dictionary with the number of subsamples per second under "name/N/scalar" and "name/N/batch"."""
+	rng = np.random.default_rng(0)
+	functions, rows_per_call = {}, {}
+	for no_draws in sizes:
+		subsets = rng.normal(100, 20, (batch_rows, no_draws))
+		rows = [list(row) for row in subsets[:scalar_rows]]
+		for name in MC_calc.ESTIMATORS:
+			functions[name + "/" + str(no_draws) + "/scalar"] = lambda name = name, rows = rows: [SCALAR_FUNCTIONS[name](row) for row in rows]
+			functions[name + "/" + str(no_draws) + "/batch"] = lambda name = name, subsets = subsets: MC_calc.BATCH_ESTIMATORS[name](subsets)
+			rows_per_call[name + "/" + str(no_draws) + "/scalar"] = scalar_rows
+			rows_per_call[name + "/" + str(no_draws) + "/batch"] = batch_rows
+		# All measures at once, sharing the order statistics
+		functions["all/" + str(no_draws) + "/batch"] = lambda subsets = subsets: MC_calc.uncertainties_batch(subsets)
+		rows_per_call["all/" + str(no_draws) + "/batch"] = batch_rows
+	times = median_times(functions, repeats)
+	return dict((key, rows_per_call[key] / times[key]) for key in functions)
+
+def benchmark_sampling(populations, sizes, repeats, draws_per_run = 2 * 10**7):
+	"""Times the drawing of subsamples without replacement for every population size and subsample size, with Floyd's algorithm, with random keys and with draw_indices (which chooses between them). Every run draws about draws_per_run random keys, so larger populations use fewer subsamples. The function returns a dictionary with the number of subsamples per second under "P/N/floyd", "P/N/keys" and "P/N/draw"."""
+	rng = np.random.default_rng(0)
+	functions, subsets_per_call = {}, {}
+	for population_size in populations:
+		no_subsets = max(100, draws_per_run // population_size)
+		for no_draws in sizes:
+			if no_draws > population_size: continue
+			key = str(population_size) + "/" + str(no_draws)
+			arguments = (rng, no_subsets, no_draws, population_size)
+			functions[key + "/floyd"] = lambda arguments = arguments: MC_sampling._floyd_indices(*arguments)
+			functions[key + "/keys"] = lambda arguments = arguments: MC_sampling._random_key_indices(*arguments)
+			functions[key + "/draw"] = lambda arguments = arguments: MC_sampling.draw_indices(*arguments)
+			for method in ("floyd", "keys", "draw"):
+				subsets_per_call[key + "/" + method] = no_subsets
+	times = median_times(functions, repeats)
+	return dict((key, subsets_per_call[key] / times[key]) for key in functions)
+
+def benchmark_pipeline(no_repetitions, sizes, repeats):
+	"""Runs the three stages of Appendix_MC_calculation.py and returns, for every stage, the median wall time of repeats runs without memory tracing, the number of subsamples per second and the peak memory use of one extra traced run."""
+	SET = MC_calc.base_set()
+	reference_stddev = MC_calc.reference_uncertainty(SET)
+	frac_stddev = dict(zip(MC_calc.ESTIMATORS, MC_calc.draw_set(SET, no_repetitions, 10, True, seed = 2, reference_stddev = reference_stddev)))
+	stage_functions = {
+		"distributions" : lambda: MC_calc.draw_set(SET, no_repetitions, 10, True, seed = 2, reference_stddev = reference_stddev),
+		"convergence" : lambda: MC_convergence.convergence_curves(frac_stddev, MC_calc.ESTIMATORS),
+		"development" : lambda: MC_parallel.sample_size_sweep(SET, reference_stddev, sizes, no_repetitions, seed = 2, workers = 1),
+	}
+	times = median_times(stage_functions, repeats)
+	stages = dict((stage, {"seconds" : times[stage], "peak_bytes" : peak_memory(function)}) for stage, function in stage_functions.items())
+	stages["distributions"]["subsamples_per_second"] = no_repetitions / stages["distributions"]["seconds"]
+	stages["convergence"]["repetitions_per_second"] = no_repetitions / stages["convergence"]["seconds"]
+	stages["development"]["subsamples_per_second"] = len(sizes) * no_repetitions / stages["development"]["seconds"]
+	return stages
+
+def compare(results, baseline, threshold):
+	"""Compares the throughputs, stage times and peak memory use of results with those of baseline and returns the list of benchmarks that became worse by more than the fraction threshold."""
+	regressions = []
+	for group in ("estimators", "sampling"):
+		for key, value in results.get(group, {}).items():
+			if key in baseline.get(group, {}) and value < (1. - threshold) * baseline[group][key]:
+				regressions.append((group + "/" + key, baseline[group][key], value))
+	for stage, values in results["pipeline"].items():
+		old = baseline.get("pipeline", {}).get(stage)
+		for key in ("seconds", "peak_bytes"):
+			if old is not None and key in old and values[key] > old[key] / (1. - threshold):
+				regressions.append((stage + "/" + key, old[key], values[key]))
+	return regressions
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Benchmark the uncertainty measures and the Monte-Carlo pipeline.")
+	parser.add_argument("--quick", action = "store_true", help = "use fewer sizes and repetitions")
+	parser.add_argument("--output", default = "bench.json", help = "JSON file to write the results to")
+	parser.add_argument("--compare", help = "JSON file of an earlier run to compare with")
+	parser.add_argument("--threshold", type = float, default = 0.2, help = "fraction by which a benchmark may be slower before it counts as a regression")
+	arguments = parser.parse_args(arguments)
+
+	if arguments.quick:
+		sizes, scalar_rows, batch_rows, repeats, no_repetitions = [4, 10, 20, 100], 200, 10000, 5, 10000
+		populations, sampling_sizes, draws_per_run = [1000], [10, 50, 100, 200], 2 * 10**6
+	else:
+		sizes, scalar_rows, batch_rows, repeats, no_repetitions = list(range(4, 21)) + [30, 50, 100], 2000, 100000, 5, 100000
+		populations, sampling_sizes, draws_per_run = [1000, 10000, 100000], [10, 20, 50, 100, 200, 400, 800], 2 * 10**7
+
+	results = {
+		"machine" : {"python" : platform.python_version(), "numpy" : np.__version__, "platform" : platform.platform()},
+		"estimators" : benchmark_estimators(sizes, scalar_rows, batch_rows, repeats),
+		"sampling" : benchmark_sampling(populations, sampling_sizes, repeats, draws_per_run),
+		"pipeline" : benchmark_pipeline(no_repetitions, list(range(4, 21)), repeats),
+	}
+
+	print("%-10s %5s %14s %14s %8s" % ("Measure", "N", "scalar [1/s]", "batch [1/s]", "speedup"))
+	for name in MC_calc.ESTIMATORS:
+		for no_draws in sizes:
+			scalar = results["estimators"][name + "/" + str(no_draws) + "/scalar"]
+			batch = results["estimators"][name + "/" + str(no_draws) + "/batch"]
+			print("%-10s %5d %14.0f %14.0f %8.1f" % (name, no_draws, scalar, batch, batch / scalar))
+	print("%-10s %5s %14s %14s %14s" % ("Population", "N", "Floyd [1/s]", "keys [1/s]", "draw [1/s]"))
+	for population_size in populations:
+		for no_draws in sampling_sizes:
+			key = str(population_size) + "/" + str(no_draws)
+			if key + "/draw" in results["sampling"]:
+				print("%-10d %5d %14.0f %14.0f %14.0f" % (population_size, no_draws, results["sampling"][key + "/floyd"], results["sampling"][key + "/keys"], results["sampling"][key + "/draw"]))
+	for stage, values in results["pipeline"].items():
+		print("%-14s %8.3f s %10.1f MB peak" % (stage, values["seconds"], values["peak_bytes"] / 1024.**2))
+
+	with open(arguments.output, "w") as output_file:
+		json.dump(results, output_file, indent = 1)
+	print("Benchmark results saved to " + arguments.output)
+
+	if arguments.compare:
+		with open(arguments.compare) as baseline_file:
+			regressions = compare(results, json.load(baseline_file), arguments.threshold)
+		for key, old, new in regressions:
+			print("Regression in " + key + ": " + str(round(old, 3)) + " -> " + str(round(new, 3)))
+		if regressions:
+			sys.exit(1)
+		print("No regressions compared to " + arguments.compare)
+
+if __name__=="__main__":
+	main()
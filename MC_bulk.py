@@ -0,0 +1,147 @@
+#!/usr/bin/python
+#################
+# Bulk evaluation of the uncertainty measures on measurement data.
+# The data is a CSV or Parquet file with a column that identifies the group (for example a
+# series of repeated measurements) and a column with the measured values. The rows of a
+# group have to be next to each other in the file. The file is read in chunks, and the
+# groups are evaluated with the batched uncertainty measures of Appendix_MC_calculation.py:
+# all groups with the same number of measurements are evaluated as one 2D array. The output
+# has a row per group with its number of measurements, mean and the chosen uncertainties.
+# Reading Parquet files, and writing them, requires pyarrow. CSV files are read with pandas
+# when it is installed, and with the csv module otherwise.
+#
+# Usage:
+#   python MC_bulk.py data.csv --group sample_id --value value [--measures stddev mad ...]
+#                     [--output results.csv | results.parquet | results_directory]
+
+import argparse
+import csv
+import os
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_store
+
+# Smallest group for which a measure is defined, smaller groups get NaN
+MINIMUM_GROUP_SIZE = {"exclextr" : 3, "stddev" : 2}
+
+def group_uncertainties(group_ids, values, estimators = MC_calc.ESTIMATORS):
+	"""Takes the group id and value of every measurement, with the measurements of a group next to each other, and calculates the mean and the uncertainties in estimators of every group. The function returns a dictionary of columns "group", "n", "mean" and the names of the estimators, with a row per group."""
+	group_ids = np.asarray(group_ids)
+	values = np.asarray(values, dtype=float)
+	starts = np.concatenate(([0], np.nonzero(group_ids[1:] != group_ids[:-1])[0] + 1)) if len(values) else np.array([], dtype=np.int64)
+	lengths = np.diff(np.append(starts, len(values)))
+	results = {"group" : group_ids[starts], "n" : lengths, "mean" : np.empty(len(starts))}
+	for name in estimators:
+		results[name] = np.full(len(starts), np.nan)
+	# Evaluate all groups with the same number of measurements at once
+	for length in np.unique(lengths):
+		selected = np.nonzero(lengths == length)[0]
+		subsets = values[starts[selected][:,None] + np.arange(length)]
+		results["mean"][selected] = MC_calc._row_mean(subsets)
+		defined = [name for name in estimators if length >= MINIMUM_GROUP_SIZE.get(name, 1)]
+		uncertainties = MC_calc.uncertainties_batch(subsets, defined)
+		for name in defined:
+			results[name][selected] = uncertainties[name]
+	return results
+
+def _read_csv(path, group_column, value_column, chunk_rows):
+	"""Yields the group ids and values of a CSV file in chunks of chunk_rows rows."""
+	try:
+		import pandas
+	except ImportError:
+		pandas = None
+	if pandas is not None:
+		for frame in pandas.read_csv(path, usecols = [group_column, value_column], chunksize = chunk_rows):
+			yield frame[group_column].to_numpy(), frame[value_column].to_numpy(dtype=float)
+		return
+	with open(path, newline = "") as csv_file:
+		reader = csv.reader(csv_file)
+		header = next(reader)
+		group_index, value_index = header.index(group_column), header.index(value_column)
+		group_ids, values = [], []
+		for row in reader:
+			group_ids.append(row[group_index])
+			values.append(float(row[value_index]))
+			if len(values) == chunk_rows:
+				yield np.array(group_ids), np.array(values)
+				group_ids, values = [], []
+		if values:
+			yield np.array(group_ids), np.array(values)
+
+def _read_parquet(path, group_column, value_column, chunk_rows):
+	"""Yields the group ids and values of a Parquet file in chunks of chunk_rows rows."""
+	import pyarrow.parquet
+	for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size = chunk_rows, columns = [group_column, value_column]):
+		yield batch.column(group_column).to_numpy(zero_copy_only = False), batch.column(value_column).to_numpy(zero_copy_only = False).astype(float)
+
+def read_chunks(path, group_column, value_column, chunk_rows = 1000000):
+	"""Yields the group ids and values of a CSV or Parquet file (by extension) in chunks of chunk_rows rows."""
+	if path.endswith(".parquet"):
+		return _read_parquet(path, group_column, value_column, chunk_rows)
+	return _read_csv(path, group_column, value_column, chunk_rows)
+
+def bulk_uncertainties(chunks, estimators = MC_calc.ESTIMATORS):
+	"""Takes an iterable of (group ids, values) chunks and yields the results of group_uncertainties for every chunk. The last group of a chunk may continue in the next chunk, so it is carried over and evaluated with the next chunk."""
+	carried_ids, carried_values = None, None
+	for group_ids, values in chunks:
+		if carried_ids is not None:
+			group_ids = np.concatenate((carried_ids, group_ids))
+			values = np.concatenate((carried_values, values))
+		if len(values) == 0:
+			continue
+		# The rows of the last group of this chunk are carried over to the next chunk
+		last_start = len(group_ids) - 1
+		while last_start > 0 and group_ids[last_start - 1] == group_ids[-1]:
+			last_start -= 1
+		carried_ids, carried_values = group_ids[last_start:], values[last_start:]
+		if last_start > 0:
+			yield group_uncertainties(group_ids[:last_start], values[:last_start], estimators)
+	if carried_ids is not None and len(carried_values):
+		yield group_uncertainties(carried_ids, carried_values, estimators)
+
+def write_results(results, path, estimators):
+	"""Writes an iterable of result chunks to path: a CSV file, a Parquet file (by extension) or otherwise a MC_store result directory. The number of groups is returned."""
+	columns = ["group", "n", "mean"] + list(estimators)
+	no_groups = 0
+	if path.endswith(".csv"):
+		with open(path, "w", newline = "") as csv_file:
+			writer = csv.writer(csv_file)
+			writer.writerow(columns)
+			for chunk in results:
+				writer.writerows(zip(*[chunk[column].tolist() for column in columns]))
+				no_groups += len(chunk["n"])
+	elif path.endswith(".parquet"):
+		import pyarrow
+		import pyarrow.parquet
+		writer = None
+		for chunk in results:
+			table = pyarrow.table(dict((column, chunk[column]) for column in columns))
+			if writer is None: writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+			writer.write_table(table)
+			no_groups += len(chunk["n"])
+		if writer is not None: writer.close()
+	else:
+		chunks = list(results)
+		stored = dict((column, np.concatenate([chunk[column] for chunk in chunks]) if chunks else np.array([])) for column in columns)
+		if stored["group"].dtype == object: stored["group"] = stored["group"].astype(str)
+		no_groups = len(stored["n"])
+		MC_store.save_results(path, stored, {"estimators" : list(estimators), "estimator_parameters" : MC_calc.ESTIMATOR_PARAMETERS})
+	return no_groups
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Calculate the uncertainty measures of every group of measurements in a CSV or Parquet file.")
+	parser.add_argument("input", help = "CSV or Parquet file, with the rows of a group next to each other")
+	parser.add_argument("--group", required = True, help = "name of the column with the group id")
+	parser.add_argument("--value", required = True, help = "name of the column with the measured value")
+	parser.add_argument("--measures", nargs = "+", default = list(MC_calc.ESTIMATORS), choices = list(MC_calc.ESTIMATORS))
+	parser.add_argument("--output", default = None, help = "CSV file, Parquet file or result directory, defaults to the input name with _uncertainties.csv")
+	parser.add_argument("--chunk-rows", type = int, default = 1000000, help = "number of rows that is read at once")
+	arguments = parser.parse_args(arguments)
+
+	output = arguments.output or os.path.splitext(arguments.input)[0] + "_uncertainties.csv"
+	chunks = read_chunks(arguments.input, arguments.group, arguments.value, arguments.chunk_rows)
+	no_groups = write_results(bulk_uncertainties(chunks, arguments.measures), output, arguments.measures)
+	print(str(no_groups) + " groups succesfully saved to " + output)
+
+if __name__=="__main__":
+	main()
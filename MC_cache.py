@@ -0,0 +1,170 @@
+#!/usr/bin/python
+#################
+# Content-addressed cache of the chunks of the Monte-Carlo calculation.
+# Every chunk of iterations is stored under a hash of everything that determines it: the
+# population (its values and description), the stage, the subsample size N, the seed
+# stream, the chunk size, the sampling mode and the parameters of the uncertainty measures.
+# A sweep only calculates the chunks that are missing from the cache, so extending the range
+# of N or the number of repetitions reuses all chunks that were calculated before. The cache has a size
+# limit, above which the least recently used chunks are removed. The index of the cache is
+# checked against the directory when the cache is opened, so the chunks of an interrupted run are kept.
+
+import hashlib
+import json
+import os
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_parallel
+import MC_sampling
+import MC_streaming
+
+# Version of the cached data, to be increased when the calculation of a chunk changes
+CACHE_VERSION = 2
+INDEX = "index.json"
+
+def cell_key(population, no_draws, seed, chunk_size, replace, kind, stream, description = None):
+	"""Returns the hash that identifies the chunks of one (population, stage, N, seed stream) cell. kind is "deviations" or "accumulators", stream the stage whose seed streams are used (see MC_sampling.STREAMS), description an optional JSON-able description of the population (distribution, seed, size)."""
+	seed = MC_sampling.as_seed_sequence(seed)
+	cell = {
+		"version" : CACHE_VERSION,
+		"population" : hashlib.sha256(np.ascontiguousarray(population, dtype=float).tobytes()).hexdigest(),
+		"description" : description,
+		"no_draws" : int(no_draws),
+		"seed" : [str(seed.entropy), [int(key) for key in seed.spawn_key]],
+		"chunk_size" : int(chunk_size),
+		"replace" : bool(replace),
+		"kind" : kind,
+		"stream" : stream,
+		"estimators" : list(MC_calc.ESTIMATORS),
+		"estimator_parameters" : MC_calc.ESTIMATOR_PARAMETERS,
+		"bin_edges" : hashlib.sha256(MC_streaming.BIN_EDGES.tobytes()).hexdigest(),
+	}
+	return hashlib.sha256(json.dumps(cell, sort_keys = True).encode()).hexdigest()
+
+class ResultCache:
+	"""Cache of chunk results in directory, limited to max_bytes. Every chunk is an .npy file in a subdirectory named after the hash of its cell, and the index records the size of every chunk and when it was last used."""
+
+	def __init__(self, directory, max_bytes = 2 * 1024**3):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		os.makedirs(directory, exist_ok = True)
+		self.index = {"clock" : 0, "entries" : {}}
+		if os.path.exists(os.path.join(directory, INDEX)):
+			with open(os.path.join(directory, INDEX)) as index_file:
+				self.index = json.load(index_file)
+		self._reconcile()
+		self.total = self.size()
+
+	def _reconcile(self):
+		"""Brings the index in line with the cache directory, after a run that was interrupted before the index was written: chunk files that are missing from the index are added as the least recently used ones, entries without a file are removed, and partly written files are deleted."""
+		stored = set()
+		for cell in os.listdir(self.directory):
+			if not os.path.isdir(os.path.join(self.directory, cell)):
+				continue
+			for name in os.listdir(os.path.join(self.directory, cell)):
+				if name.endswith(".tmp"):
+					os.remove(os.path.join(self.directory, cell, name))
+				elif name.endswith(".npy"):
+					stored.add(os.path.join(cell, name))
+		for entry in list(self.index["entries"]):
+			if entry not in stored:
+				del self.index["entries"][entry]
+		for entry in stored - set(self.index["entries"]):
+			self.index["entries"][entry] = {"bytes" : os.path.getsize(os.path.join(self.directory, entry)), "used" : 0}
+
+	def _entry(self, cell, chunk_index, length):
+		"""Returns the name of the file of a chunk of length iterations, relative to the cache directory."""
+		return os.path.join(cell, str(chunk_index) + "-" + str(length) + ".npy")
+
+	def _touch(self, entry):
+		"""Marks an entry as the most recently used one."""
+		self.index["clock"] += 1
+		self.index["entries"][entry]["used"] = self.index["clock"]
+
+	def get(self, cell, chunk_index, length):
+		"""Returns the stored array of a chunk, or None when it is not in the cache."""
+		entry = self._entry(cell, chunk_index, length)
+		if entry not in self.index["entries"] or not os.path.exists(os.path.join(self.directory, entry)):
+			return None
+		self._touch(entry)
+		return np.load(os.path.join(self.directory, entry))
+
+	def put(self, cell, chunk_index, length, array):
+		"""Stores the array of a chunk in the cache, and evicts chunks when the cache becomes larger than max_bytes. The file is written under a temporary name first, so an interrupted run never leaves a partly written chunk."""
+		entry = self._entry(cell, chunk_index, length)
+		os.makedirs(os.path.join(self.directory, cell), exist_ok = True)
+		with open(os.path.join(self.directory, entry + ".tmp"), "wb") as chunk_file:
+			np.save(chunk_file, array)
+		os.replace(os.path.join(self.directory, entry + ".tmp"), os.path.join(self.directory, entry))
+		if entry in self.index["entries"]:
+			self.total -= self.index["entries"][entry]["bytes"]
+		self.index["entries"][entry] = {"bytes" : os.path.getsize(os.path.join(self.directory, entry)), "used" : 0}
+		self.total += self.index["entries"][entry]["bytes"]
+		self._touch(entry)
+		if self.total > self.max_bytes:
+			self.evict()
+
+	def size(self):
+		"""Returns the total size of the cached chunks in bytes."""
+		return sum(entry["bytes"] for entry in self.index["entries"].values())
+
+	def evict(self):
+		"""Removes the least recently used chunks until the cache is no larger than max_bytes."""
+		for entry in sorted(self.index["entries"], key = lambda entry: self.index["entries"][entry]["used"]):
+			if self.total <= self.max_bytes:
+				break
+			self.total -= self.index["entries"][entry]["bytes"]
+			del self.index["entries"][entry]
+			if os.path.exists(os.path.join(self.directory, entry)):
+				os.remove(os.path.join(self.directory, entry))
+
+	def flush(self):
+		"""Evicts chunks when the cache is too large and writes the index."""
+		self.evict()
+		with open(os.path.join(self.directory, INDEX + ".tmp"), "w") as index_file:
+			json.dump(self.index, index_file)
+		os.replace(os.path.join(self.directory, INDEX + ".tmp"), os.path.join(self.directory, INDEX))
+
+def _pack_result(kind, result):
+	"""Converts the result of a chunk to a single array, one row per uncertainty measure."""
+	if kind == "deviations":
+		return np.array([result[name] for name in MC_calc.ESTIMATORS])
+	return np.array([MC_streaming.pack(result[name]) for name in MC_calc.ESTIMATORS])
+
+def _unpack_result(kind, array):
+	"""Converts an array stored by _pack_result back to the result of a chunk."""
+	if kind == "deviations":
+		return dict((name, array[estimator_index]) for estimator_index, name in enumerate(MC_calc.ESTIMATORS))
+	return dict((name, MC_streaming.unpack(array[estimator_index])) for estimator_index, name in enumerate(MC_calc.ESTIMATORS))
+
+def cached_tasks(cache, SET, reference_stddev, tasks, workers = None, description = None):
+	"""Returns the results of a list of MC_parallel tasks, in order. Tasks that are in the cache are read from it, the others are calculated with MC_parallel.iter_tasks and added to the cache as soon as they finish."""
+	population = MC_sampling.prepare_population(SET)
+	results = [None] * len(tasks)
+	keys = []
+	for task_index, task in enumerate(tasks):
+		kind, stream, no_draws, chunk_index, chunk_size, no_iterations, seed, replace = task
+		length = min(chunk_size, no_iterations - chunk_index * chunk_size)
+		keys.append((cell_key(population, no_draws, seed, chunk_size, replace, kind, stream, description), chunk_index, length))
+		cached = cache.get(*keys[-1])
+		if cached is not None: results[task_index] = _unpack_result(kind, cached)
+	missing = [task_index for task_index in range(len(tasks)) if results[task_index] is None]
+	# Every result is stored as soon as its task finishes, so an interrupted sweep keeps the finished chunks
+	for missing_index, result in MC_parallel.iter_tasks(population, reference_stddev, [tasks[task_index] for task_index in missing], workers):
+		task_index = missing[missing_index]
+		results[task_index] = result
+		cache.put(*keys[task_index], _pack_result(tasks[task_index][0], result))
+	cache.flush()
+	return results
+
+def cached_sample_size_sweep(cache, SET, reference_stddev, sizes, no_iterations, seed = None, workers = None, chunk_size = 10000, replace = False, description = None):
+	"""Cached version of MC_parallel.sample_size_sweep, which only calculates the chunks that are not in the cache. The result is identical to the uncached sweep."""
+	seed = MC_sampling.as_seed_sequence(seed)
+	results = cached_tasks(cache, SET, reference_stddev, MC_parallel.sweep_tasks(sizes, no_iterations, seed, chunk_size, replace), workers, description)
+	return MC_parallel.reduce_sweep(results, sizes)
+
+def cached_draw_set(cache, SET, reference_stddev, no_iterations, no_draws, seed = None, workers = None, chunk_size = 10000, replace = False, description = None):
+	"""Cached version of draw_set with return_distribution set to true, which only calculates the chunks that are not in the cache. The function returns a dictionary with the deviations of every uncertainty measure."""
+	seed = MC_sampling.as_seed_sequence(seed)
+	chunks = cached_tasks(cache, SET, reference_stddev, MC_parallel.sweep_tasks([no_draws], no_iterations, seed, chunk_size, replace, "deviations", "distribution"), workers, description)
+	return dict((name, np.concatenate([chunk[name] for chunk in chunks])) for name in MC_calc.ESTIMATORS)
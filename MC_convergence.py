@@ -0,0 +1,94 @@
+#!/usr/bin/python
+#################
+# Running mean, standard deviation and standard error of the deviations, as a function of
+# the number of repetitions. The curves are built in a single cumulative pass over the
+# deviations, so the cost is linear in the number of repetitions. Optionally, only a set
+# of (log-spaced) checkpoints is kept, which keeps the curves compact for long runs. The
+# moments can also be updated chunk by chunk while the deviations are streamed. For
+# plotting, a curve can be reduced further with the Largest-Triangle-Three-Buckets method.
+# Used by Appendix_MC_calculation.py to create the convergence dictionary.
+
+import numpy as np
+
+def log_checkpoints(no_repetitions, no_points):
+	"""Returns at most no_points repetition counts between 1 and no_repetitions, spaced logarithmically. The last checkpoint is always no_repetitions itself."""
+	checkpoints = np.unique(np.round(np.logspace(0, np.log10(no_repetitions), no_points)).astype(np.int64))
+	checkpoints[-1] = no_repetitions
+	return checkpoints
+
+def new_running_moments(checkpoints):
+	"""Returns the state of running moments that are recorded after the numbers of repetitions in checkpoints. The state is updated with update_running_moments, one chunk of deviations at a time, so the deviations do not have to be kept in memory."""
+	checkpoints = np.asarray(checkpoints, dtype=np.int64)
+	return {"checkpoints" : checkpoints, "count" : 0, "shift" : None, "total" : 0., "shifted_total" : 0., "shifted_squares" : 0., "means" : np.empty(len(checkpoints)), "squares" : np.empty(len(checkpoints))}
+
+def update_running_moments(state, chunk):
+	"""Adds the next chunk of deviations to the state of running moments, and records the moments at the checkpoints that fall within the chunk."""
+	chunk = np.asarray(chunk, dtype=float)
+	if len(chunk) == 0:
+		return
+	# The running sum is accumulated strictly from left to right, so the running mean equals sum(deviations[:i+1])/(i+1).
+	# The squares are taken relative to the first deviation, which keeps the variance well conditioned.
+	if state["shift"] is None: state["shift"] = chunk[0]
+	start, stop = state["count"], state["count"] + len(chunk)
+	checkpoints = state["checkpoints"]
+	selected = (checkpoints > start) & (checkpoints <= stop)
+	cumulative = np.cumsum(np.concatenate(([state["total"]], chunk)))[1:]
+	shifted_cumulative = state["shifted_total"] + np.cumsum(chunk - state["shift"])
+	squares_cumulative = state["shifted_squares"] + np.cumsum((chunk - state["shift"])**2)
+	index = checkpoints[selected] - start - 1
+	state["means"][selected] = 1.*cumulative[index]/checkpoints[selected]
+	state["squares"][selected] = squares_cumulative[index] - shifted_cumulative[index]**2/checkpoints[selected]
+	state["count"], state["total"], state["shifted_total"], state["shifted_squares"] = stop, cumulative[-1], shifted_cumulative[-1], squares_cumulative[-1]
+
+def finish_running_moments(state):
+	"""Returns the running moments recorded in a state, as a dictionary with keys "repetitions", "mean", "uncertainty" and "sem"."""
+	checkpoints = state["checkpoints"]
+	with np.errstate(divide = "ignore", invalid = "ignore"):
+		uncert = np.sqrt(np.maximum(state["squares"], 0.)/(checkpoints - 1.))
+		uncert[checkpoints < 2] = np.nan
+		sem = uncert/np.sqrt(checkpoints)
+	return {"repetitions" : checkpoints, "mean" : state["means"], "uncertainty" : uncert, "sem" : sem}
+
+def running_moments(deviations, checkpoints = None, chunk_size = 1000000):
+	"""Takes an array of deviations and calculates the running mean, the running (sample) standard deviation and the running standard error of the mean after every repetition. When checkpoints is given, only the values after these numbers of repetitions are returned. The deviations are processed in chunks of chunk_size, so the temporary memory use is bounded. The function returns a dictionary with keys "repetitions", "mean", "uncertainty" and "sem"."""
+	deviations = np.asarray(deviations, dtype=float)
+	if checkpoints is None: checkpoints = np.arange(1, len(deviations) + 1)
+	state = new_running_moments(checkpoints)
+	for start in range(0, len(deviations), chunk_size):
+		update_running_moments(state, deviations[start:start + chunk_size])
+	return finish_running_moments(state)
+
+def curves_from_moments(moments):
+	"""Takes a dictionary with the running moments of every uncertainty measure and returns them in the form of convergence_curves."""
+	convergence = {}
+	for name in moments:
+		convergence[name] = moments[name]["mean"]
+		convergence[name + "_uncs"] = moments[name]["uncertainty"]
+		convergence[name + "_sems"] = moments[name]["sem"]
+		convergence["repetitions"] = moments[name]["repetitions"]
+	return convergence
+
+def convergence_curves(deviations, estimators, checkpoints = None):
+	"""Takes a dictionary with the deviations of every uncertainty measure and calculates their running moments. The returned dictionary contains the running mean under the name of the estimator, the running standard deviation under name_uncs and the running standard error under name_sems, and the repetition counts under "repetitions"."""
+	return curves_from_moments(dict((name, running_moments(deviations[name], checkpoints)) for name in estimators))
+
+def lttb_indices(x, y, no_points):
+	"""Selects at most no_points points of the curve (x, y) with the Largest-Triangle-Three-Buckets method, which keeps the visual shape of the curve. The first and last points are always kept. The function returns the indices of the selected points."""
+	x = np.asarray(x, dtype=float)
+	y = np.asarray(y, dtype=float)
+	if no_points >= len(x) or no_points < 3:
+		return np.arange(len(x))
+	# The points between the first and the last are divided into no_points - 2 buckets
+	edges = np.floor(np.linspace(1, len(x) - 1, no_points - 1)).astype(np.int64)
+	selected = np.empty(no_points, dtype=np.int64)
+	selected[0], selected[-1] = 0, len(x) - 1
+	previous = 0
+	for bucket in range(no_points - 2):
+		start, end = edges[bucket], edges[bucket + 1]
+		next_start, next_end = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (len(x) - 1, len(x))
+		# Keep the point of the bucket that forms the largest triangle with the previous point and the average of the next bucket
+		next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+		area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+		previous = start + np.argmax(area)
+		selected[bucket + 1] = previous
+	return selected
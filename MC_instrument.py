@@ -0,0 +1,143 @@
+#!/usr/bin/python
+#################
+# Instrumentation of the Monte-Carlo calculation.
+# When enabled, the wall time and number of calls of every timed section (the uncertainty
+# measures, the sampling and the stages of the calculation) are recorded, together with
+# counters, and the progress of long loops is reported with the number of iterations per
+# second and the estimated remaining time. Optionally, the run is profiled with cProfile
+# and its memory use is traced with tracemalloc. When disabled, a timed section costs one
+# function call that returns a shared no-op context manager.
+
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+enabled = False
+_timers = {}
+_counters = {}
+_profiler = None
+
+class _NullTimer:
+	"""Context manager that does nothing, returned by timer when the instrumentation is disabled."""
+	def __enter__(self):
+		return self
+	def __exit__(self, *exception):
+		return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+	"""Context manager that adds its wall time and one call to the timer name."""
+	def __init__(self, name):
+		self.name = name
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+	def __exit__(self, *exception):
+		timer_value = _timers.setdefault(self.name, [0, 0.])
+		timer_value[0] += 1
+		timer_value[1] += time.perf_counter() - self.start
+		return False
+
+def timer(name):
+	"""Returns a context manager that records the wall time and number of calls of the section it encloses under name."""
+	if not enabled:
+		return _NULL_TIMER
+	return _Timer(name)
+
+def count(name, number = 1):
+	"""Adds number to the counter name."""
+	if enabled:
+		_counters[name] = _counters.get(name, 0) + number
+
+def enable(profile = False, trace_memory = False):
+	"""Switches the instrumentation on, optionally with cProfile profiling and tracemalloc memory tracing."""
+	global enabled, _profiler
+	enabled = True
+	if trace_memory and not tracemalloc.is_tracing():
+		tracemalloc.start()
+	if profile:
+		_profiler = cProfile.Profile()
+		_profiler.enable()
+
+def disable():
+	"""Switches the instrumentation, profiling and memory tracing off. The recorded values are kept."""
+	global enabled
+	enabled = False
+	if _profiler is not None:
+		_profiler.disable()
+	if tracemalloc.is_tracing():
+		tracemalloc.stop()
+
+def reset():
+	"""Removes all recorded timers and counters."""
+	_timers.clear()
+	_counters.clear()
+
+def snapshot():
+	"""Returns the recorded timers and counters, so they can be sent from a worker process to the main process."""
+	return {"timers" : dict((name, list(value)) for name, value in _timers.items()), "counters" : dict(_counters)}
+
+def merge_snapshot(other):
+	"""Adds the timers and counters of a snapshot, for example of a worker process, to the recorded ones."""
+	for name, (calls, seconds) in other["timers"].items():
+		timer_value = _timers.setdefault(name, [0, 0.])
+		timer_value[0] += calls
+		timer_value[1] += seconds
+	for name, number in other["counters"].items():
+		_counters[name] = _counters.get(name, 0) + number
+
+def report():
+	"""Returns the recorded timers (calls and seconds), counters and, when memory is traced, the current and peak memory use in bytes."""
+	result = {"timers" : dict((name, {"calls" : calls, "seconds" : seconds}) for name, (calls, seconds) in sorted(_timers.items())), "counters" : dict(sorted(_counters.items()))}
+	if tracemalloc.is_tracing():
+		current, peak = tracemalloc.get_traced_memory()
+		result["memory"] = {"current_bytes" : current, "peak_bytes" : peak}
+	return result
+
+def write_report(path):
+	"""Writes the report to the JSON file path. When the run was profiled, the cProfile statistics are written to path with the extension .prof, and the 20 most expensive functions are printed."""
+	with open(path, "w") as report_file:
+		json.dump(report(), report_file, indent = 1)
+	if _profiler is not None:
+		_profiler.disable()
+		profile_path = path.rsplit(".", 1)[0] + ".prof"
+		_profiler.dump_stats(profile_path)
+		pstats.Stats(profile_path).sort_stats("cumulative").print_stats(20)
+
+def format_duration(seconds):
+	"""Formats a number of seconds as hours:minutes:seconds, preceded by the number of days when it is a day or longer."""
+	if seconds == float("inf"):
+		return "unknown"
+	minutes, seconds = divmod(int(round(seconds)), 60)
+	hours, minutes = divmod(minutes, 60)
+	days, hours = divmod(hours, 24)
+	if days:
+		return "%dd %02d:%02d:%02d" % (days, hours, minutes, seconds)
+	return "%02d:%02d:%02d" % (hours, minutes, seconds)
+
+class Progress:
+	"""Reports the progress of a loop of total iterations to stderr, at most once every interval seconds, with the number of iterations per second and the estimated remaining time. It does nothing when the instrumentation is disabled."""
+
+	def __init__(self, total, label, interval = 2.):
+		self.total = total
+		self.label = label
+		self.interval = interval
+		self.done = 0
+		self.start = self.last = time.perf_counter()
+
+	def update(self, number = 1):
+		"""Adds number finished iterations."""
+		if not enabled:
+			return
+		self.done += number
+		now = time.perf_counter()
+		if now - self.last < self.interval and self.done < self.total:
+			return
+		self.last = now
+		rate = self.done / max(now - self.start, 1e-9)
+		remaining = (self.total - self.done) / rate if rate > 0 else float("inf")
+		sys.stderr.write("%s: %d/%d (%.0f%%), %.0f it/s, ETA %s\n" % (self.label, self.done, self.total, 100. * self.done / max(self.total, 1), rate, format_duration(remaining)))
@@ -0,0 +1,93 @@
+#!/usr/bin/python
+#################
+# Parallel version of the sample size sweep of Appendix_MC_calculation.py.
+# The sweep over the subsample sizes N is split into (N, chunk) tasks that are spread over a
+# process pool. Every chunk draws from its own seed stream, derived from one SeedSequence,
+# the "development" stage, the subsample size and the chunk number, and the chunks are
+# reduced in a fixed order. The resulting development dictionary is therefore identical for
+# any number of workers, and identical to running draw_set with stream "development" for
+# every N one after another.
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import Appendix_MC_calculation as MC_calc
+import MC_sampling
+import MC_streaming
+import MC_instrument
+
+# The population and reference standard deviation of the worker processes, set once per worker by _init_worker
+_population = None
+_reference_stddev = None
+
+def _init_worker(population, reference_stddev, instrumented = False):
+	"""Stores the population and the reference standard deviation in the worker process, so they are not sent along with every task. When instrumented is true, the instrumentation of the worker process is switched on."""
+	global _population, _reference_stddev
+	_population = population
+	_reference_stddev = reference_stddev
+	if instrumented: MC_instrument.enable()
+
+def _run_task(task):
+	"""Calculates one (kind, stream, N, chunk) task in a worker process. Tasks of kind "deviations" return the deviations themselves, tasks of kind "accumulators" their accumulators. stream is the stage whose seed streams are used, see MC_sampling.STREAMS."""
+	kind, stream, no_draws, chunk_index, chunk_size, no_iterations, seed, replace = task
+	if kind == "deviations":
+		return MC_calc.deviation_chunk(_population, _reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace, stream = stream)
+	return MC_calc.accumulator_chunk(_population, _reference_stddev, no_draws, chunk_index, chunk_size, no_iterations, seed, replace, stream = stream)
+
+def _run_instrumented_task(task):
+	"""Runs a task in an instrumented worker process and returns its result together with the timers and counters it recorded."""
+	MC_instrument.reset()
+	result = _run_task(task)
+	return result, MC_instrument.snapshot()
+
+def _task_length(task):
+	"""Returns the number of iterations of a task."""
+	kind, stream, no_draws, chunk_index, chunk_size, no_iterations, seed, replace = task
+	return min(chunk_size, no_iterations - chunk_index * chunk_size)
+
+def sweep_tasks(sizes, no_iterations, seed, chunk_size = 10000, replace = False, kind = "accumulators", stream = "development"):
+	"""Returns the (kind, stream, N, chunk) tasks of no_iterations subsamples for every subsample size in sizes, ordered by subsample size and chunk."""
+	no_chunks = (no_iterations + chunk_size - 1) // chunk_size
+	return [(kind, stream, no_draws, chunk_index, chunk_size, no_iterations, seed, replace) for no_draws in sizes for chunk_index in range(no_chunks)]
+
+def iter_tasks(population, reference_stddev, tasks, workers = None):
+	"""Runs a list of tasks on a pool of workers processes (all cores when workers is None, in this process when workers is 1) and yields (task index, result) pairs as soon as every task finishes, which is not necessarily in the order of the tasks. When the instrumentation is on, the timers of the worker processes are added to the ones of this process."""
+	progress = MC_instrument.Progress(sum(_task_length(task) for task in tasks), "sweep")
+	if workers == 1 or len(tasks) <= 1:
+		_init_worker(population, reference_stddev)
+		for task_index, task in enumerate(tasks):
+			result = _run_task(task)
+			progress.update(_task_length(task))
+			yield task_index, result
+		return
+	instrumented = MC_instrument.enabled
+	with ProcessPoolExecutor(max_workers = workers, initializer = _init_worker, initargs = (population, reference_stddev, instrumented)) as executor:
+		futures = dict((executor.submit(_run_instrumented_task if instrumented else _run_task, task), task_index) for task_index, task in enumerate(tasks))
+		for future in as_completed(futures):
+			result = future.result()
+			if instrumented:
+				result, snapshot = result
+				MC_instrument.merge_snapshot(snapshot)
+			progress.update(_task_length(tasks[futures[future]]))
+			yield futures[future], result
+
+def run_tasks(population, reference_stddev, tasks, workers = None):
+	"""Runs a list of tasks with iter_tasks and returns their results in the order of the tasks."""
+	results = [None] * len(tasks)
+	for task_index, result in iter_tasks(population, reference_stddev, tasks, workers):
+		results[task_index] = result
+	return results
+
+def reduce_sweep(results, sizes):
+	"""Merges the chunk accumulators of every subsample size, in chunk order, and reduces them to the development dictionary."""
+	no_chunks = len(results) // len(sizes)
+	accumulators = []
+	for size_index in range(len(sizes)):
+		chunks = results[size_index * no_chunks:(size_index + 1) * no_chunks]
+		accumulators.append(dict((name, MC_streaming.merge_all([chunk[name] for chunk in chunks])) for name in MC_calc.ESTIMATORS))
+	return MC_calc.development_dictionary(accumulators)
+
+def sample_size_sweep(SET, reference_stddev, sizes, no_iterations, seed = None, workers = None, chunk_size = 10000, replace = False):
+	"""Runs no_iterations subsamples for every subsample size in sizes, spread over a pool of workers processes (all cores when workers is None, in this process when workers is 1). The function returns the development dictionary, with the mean and standard deviation of the deviations of every uncertainty measure under name_means and name_uncs, one value per subsample size."""
+	population = MC_sampling.prepare_population(SET)
+	seed = MC_sampling.as_seed_sequence(seed)
+	results = run_tasks(population, reference_stddev, sweep_tasks(sizes, no_iterations, seed, chunk_size, replace), workers)
+	return reduce_sweep(results, sizes)
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+#################
+# Drawing of subsamples from the base set for the Monte-Carlo calculation.
+# The population is prepared once, after which whole batches of subsamples are drawn as
+# index arrays with a numpy.random.Generator. Without replacement, small subsamples are
+# drawn with a vectorized version of Floyd's algorithm and large ones with random keys.
+# Every chunk of iterations gets its own seed stream, derived from one SeedSequence, the
+# stage of the calculation, the subsample size and the chunk number, so a fixed seed always
+# reproduces the same draws while the stages remain independent of each other.
+
+import numpy as np
+
+def prepare_population(SET):
+	"""Takes the base set and returns it as a contiguous float array, from which the subsamples are drawn."""
+	return np.ascontiguousarray(SET, dtype=float)
+
+def as_seed_sequence(seed):
+	"""Takes an integer seed, a SeedSequence or None (fresh entropy) and returns a SeedSequence."""
+	if isinstance(seed, np.random.SeedSequence):
+		return seed
+	return np.random.SeedSequence(seed)
+
+# The stages of the calculation that draw subsamples. Every stage has its own streams, so the distributions and the N = 10 cell of the sample size sweep are independent runs
+STREAMS = {"distribution" : 0, "development" : 1}
+
+def chunk_seed(seed, stream, no_draws, chunk_index):
+	"""Returns the SeedSequence of chunk number chunk_index of the iterations with subsample size no_draws in stage stream (a key of STREAMS). The stream only depends on the seed, stream, no_draws and chunk_index, so chunks can be calculated in any order or process."""
+	seed = as_seed_sequence(seed)
+	return np.random.SeedSequence(seed.entropy, spawn_key = tuple(seed.spawn_key) + (STREAMS[stream], no_draws, chunk_index))
+
+# Floyd's algorithm is used while no_draws^2 <= FLOYD_FACTOR * population_size. The crossover was measured with
+# MC_benchmark.py (sampling benchmark): both methods take the same time at about no_draws^2 = 10 * population_size,
+# for example N = 100 for a population of 1000 and N = 350 for a population of 10000.
+FLOYD_FACTOR = 10
+# Largest number of random keys that is drawn at once
+RANDOM_KEY_BATCH = 2**22
+
+def _floyd_indices(rng, no_subsets, no_draws, population_size):
+	"""Draws no_subsets rows of no_draws distinct indices below population_size with Floyd's algorithm, one column at a time for all rows."""
+	indices = np.empty((no_subsets, no_draws), dtype=np.int64)
+	for column, j in enumerate(range(population_size - no_draws, population_size)):
+		candidate = rng.integers(0, j + 1, size=no_subsets)
+		taken = (indices[:,:column] == candidate[:,None]).any(axis=1)
+		indices[:,column] = np.where(taken, j, candidate)
+	return indices
+
+def _random_key_indices(rng, no_subsets, no_draws, population_size):
+	"""Draws no_subsets rows of no_draws distinct indices below population_size by taking the smallest no_draws of population_size random keys. The keys are drawn for at most RANDOM_KEY_BATCH keys at a time, which bounds the memory use."""
+	indices = np.empty((no_subsets, no_draws), dtype=np.int64)
+	rows_per_batch = max(1, RANDOM_KEY_BATCH // population_size)
+	for start in range(0, no_subsets, rows_per_batch):
+		stop = min(start + rows_per_batch, no_subsets)
+		keys = rng.random((stop - start, population_size))
+		if no_draws == population_size:
+			indices[start:stop] = np.argsort(keys, axis=1)
+		else:
+			indices[start:stop] = np.argpartition(keys, no_draws - 1, axis=1)[:,:no_draws]
+	return indices
+
+def draw_indices(rng, no_subsets, no_draws, population_size, replace = False):
+	"""Returns a (no_subsets x no_draws) array of indices into a population of population_size items. Without replacement the indices within a row are distinct, with replace set to true they are drawn independently (bootstrap)."""
+	if replace:
+		return rng.integers(0, population_size, size=(no_subsets, no_draws))
+	if no_draws > population_size:
+		raise ValueError("Cannot draw " + str(no_draws) + " items without replacement from a set of " + str(population_size))
+	# Floyd's algorithm costs no_draws^2 comparisons per row, the random keys cost population_size random numbers and a partition per row
+	if no_draws**2 <= FLOYD_FACTOR * population_size:
+		return _floyd_indices(rng, no_subsets, no_draws, population_size)
+	return _random_key_indices(rng, no_subsets, no_draws, population_size)
+
+def draw_subsets(population, rng, no_subsets, no_draws, replace = False):
+	"""Draws no_subsets subsamples of no_draws items from the prepared population and returns them as the rows of a 2D array."""
+	return population[draw_indices(rng, no_subsets, no_draws, len(population), replace)]
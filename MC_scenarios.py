@@ -0,0 +1,98 @@
+#!/usr/bin/python
+#################
+# Comparison of the uncertainty measures over a grid of populations.
+# A scenario describes a population: its distribution, size and seed. Every population is
+# created and prepared once, after which the sample size sweep of Appendix_MC_calculation.py
+# is run on it in batched chunks, spread over a process pool. The results of all scenarios
+# are collected in one table with a row per (scenario, N, uncertainty measure).
+#
+# Usage:
+#   python MC_scenarios.py [--distributions normal uniform ...] [--sizes 100 1000 ...]
+#                          [--N 4 20] [--repetitions 10000] [--output App-scenarios]
+
+import argparse
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_cache
+import MC_parallel
+import MC_sampling
+import MC_store
+
+# The distributions of the populations. All have a mean of about 100 and a standard deviation of about 20.
+DISTRIBUTIONS = {
+	"normal" : lambda rng, size: rng.normal(100, 20, size),
+	"uniform" : lambda rng, size: rng.uniform(100 - 20 * np.sqrt(3), 100 + 20 * np.sqrt(3), size),
+	"lognormal" : lambda rng, size: 100 * rng.lognormal(-0.5 * np.log(1.04), np.sqrt(np.log(1.04)), size),
+	"student_t" : lambda rng, size: 100 + 20 / np.sqrt(3) * rng.standard_t(3, size),
+	"bimodal" : lambda rng, size: np.where(rng.random(size) < 0.5, -1., 1.) * 18 + rng.normal(100, np.sqrt(20**2 - 18**2), size),
+}
+
+def make_scenario(distribution, size, seed = 2):
+	"""Returns the description of a scenario: a population of size values from distribution, created with seed."""
+	if distribution not in DISTRIBUTIONS:
+		raise ValueError("Unknown distribution " + distribution + ", choose from " + ", ".join(DISTRIBUTIONS))
+	return {"name" : distribution + "-" + str(size), "distribution" : distribution, "size" : int(size), "seed" : seed}
+
+def scenario_grid(distributions, sizes, seed = 2):
+	"""Returns the scenarios of every combination of distribution and population size."""
+	return [make_scenario(distribution, size, seed) for distribution in distributions for size in sizes]
+
+def make_population(scenario):
+	"""Creates the population of a scenario. The normal population is created with base_set, so the normal scenario of size 1000 and seed 2 is the base set of Appendix_MC_calculation.py."""
+	if scenario["distribution"] == "normal":
+		return MC_calc.base_set(scenario["seed"], 100, 20, scenario["size"])
+	return DISTRIBUTIONS[scenario["distribution"]](np.random.default_rng(scenario["seed"]), scenario["size"])
+
+def run_grid(scenarios, sample_sizes, no_iterations, seed = None, workers = None, chunk_size = 10000, replace = False, cache = None):
+	"""Runs the sample size sweep over sample_sizes with no_iterations repetitions for every scenario, using MC_cache when cache is given. The function returns the results as a table: a dictionary of columns "scenario", "N", "estimator", "mean" and "uncertainty", with a row per (scenario, N, uncertainty measure)."""
+	seed = MC_sampling.as_seed_sequence(seed)
+	rows = {"scenario" : [], "N" : [], "estimator" : [], "mean" : [], "uncertainty" : []}
+	for scenario in scenarios:
+		# Create and prepare the population once per scenario
+		population = MC_sampling.prepare_population(make_population(scenario))
+		reference_stddev = MC_calc.reference_uncertainty(population)
+		if cache is None:
+			development = MC_parallel.sample_size_sweep(population, reference_stddev, sample_sizes, no_iterations, seed, workers, chunk_size, replace)
+		else:
+			development = MC_cache.cached_sample_size_sweep(cache, population, reference_stddev, sample_sizes, no_iterations, seed, workers, chunk_size, replace, scenario)
+		for size_index, no_draws in enumerate(sample_sizes):
+			for name in MC_calc.ESTIMATORS:
+				rows["scenario"].append(scenario["name"])
+				rows["N"].append(no_draws)
+				rows["estimator"].append(name)
+				rows["mean"].append(development[name + "_means"][size_index])
+				rows["uncertainty"].append(development[name + "_uncs"][size_index])
+	return dict((column, np.array(values)) for column, values in rows.items())
+
+def table_index(table):
+	"""Returns a dictionary that maps every (scenario, N, estimator) to its row in the table."""
+	return dict(((str(scenario), int(no_draws), str(name)), row) for row, (scenario, no_draws, name) in enumerate(zip(table["scenario"], table["N"], table["estimator"])))
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Compare the uncertainty measures over a grid of populations.")
+	parser.add_argument("--distributions", nargs = "+", default = list(DISTRIBUTIONS), choices = list(DISTRIBUTIONS))
+	parser.add_argument("--sizes", nargs = "+", type = int, default = [100, 1000, 10000, 100000, 1000000], help = "population sizes")
+	parser.add_argument("--N", nargs = 2, type = int, default = [4, 20], help = "smallest and largest subsample size")
+	parser.add_argument("--repetitions", type = int, default = 10000)
+	parser.add_argument("--seed", type = int, default = 2, help = "seed of the populations and of the subsamples")
+	parser.add_argument("--workers", type = int, default = None)
+	parser.add_argument("--cache-dir", default = None)
+	parser.add_argument("--output", default = "App-scenarios")
+	arguments = parser.parse_args(arguments)
+
+	scenarios = scenario_grid(arguments.distributions, arguments.sizes, arguments.seed)
+	sample_sizes = list(range(arguments.N[0], arguments.N[1] + 1))
+	cache = MC_cache.ResultCache(arguments.cache_dir) if arguments.cache_dir else None
+	table = run_grid(scenarios, sample_sizes, arguments.repetitions, arguments.seed, arguments.workers, cache = cache)
+	MC_store.save_results(arguments.output, table, {"scenarios" : scenarios, "N" : sample_sizes, "repetitions" : arguments.repetitions, "sampling_seed" : arguments.seed, "estimator_parameters" : MC_calc.ESTIMATOR_PARAMETERS})
+
+	# Print the mean deviation of every measure for the smallest and largest subsample size
+	index = table_index(table)
+	print("%-18s %4s " % ("Scenario", "N") + " ".join("%9s" % name for name in MC_calc.ESTIMATORS))
+	for scenario in scenarios:
+		for no_draws in (sample_sizes[0], sample_sizes[-1]):
+			print("%-18s %4d " % (scenario["name"], no_draws) + " ".join("%9.3f" % table["mean"][index[(scenario["name"], no_draws, name)]] for name in MC_calc.ESTIMATORS))
+	print("Scenario table succesfully saved to " + arguments.output)
+
+if __name__=="__main__":
+	main()
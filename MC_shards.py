@@ -0,0 +1,172 @@
+#!/usr/bin/python
+#################
+# Sharded version of Appendix_MC_calculation.py, to split one study over several machines.
+# A study (population, subsample sizes, repetitions and seeds) is divided into chunks of
+# iterations, and every shard calculates a disjoint, contiguous range of these chunks and
+# writes them to a small .npz file, named after a hash of the study. Every chunk draws from
+# its own seed stream, so a lost shard is recalculated exactly by running it again. The
+# parameters of the uncertainty measures are stored with the study. The merge step sorts
+# the chunks of all shard files by their position in the study, so the shard files can be
+# given in any order, and writes the same App-deviations, App-convergence and App-development result directories as
+# Appendix_MC_calculation.py.
+#
+# Usage:
+#   python MC_shards.py run --shard 0 --shards 4 [--study study.json] [--output-dir shards]
+#   python MC_shards.py merge shards/*.npz [--output-dir .]
+#   python MC_shards.py study > study.json
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_convergence
+import MC_sampling
+import MC_streaming
+import MC_store
+
+# The study of Appendix_MC_calculation.py
+DEFAULT_STUDY = {
+	"population_seed" : MC_calc.population_seed,
+	"population_mean" : 100,
+	"population_sd" : 20,
+	"population_size" : 1000,
+	"sampling_seed" : MC_calc.sampling_seed,
+	"replace" : MC_calc.bootstrap,
+	"chunk_size" : MC_calc.chunk_size,
+	"stream_distributions" : MC_calc.stream_distributions,
+	"distribution_draws" : 10,
+	"distribution_repetitions" : 10000,
+	"convergence_points" : MC_calc.convergence_points,
+	"sizes" : list(range(4, 21)),
+	"sweep_repetitions" : 10000,
+}
+
+def study_tasks(study):
+	"""Returns the list of (stage, N, chunk) tasks of a study, in a fixed order. The "distribution" tasks make up the distributions for N = distribution_draws, the "development" tasks the sweep over the subsample sizes."""
+	chunk_size = study["chunk_size"]
+	tasks = [("distribution", study["distribution_draws"], chunk_index) for chunk_index in range((study["distribution_repetitions"] + chunk_size - 1) // chunk_size)]
+	for no_draws in study["sizes"]:
+		tasks += [("development", no_draws, chunk_index) for chunk_index in range((study["sweep_repetitions"] + chunk_size - 1) // chunk_size)]
+	return tasks
+
+def shard_tasks(study, shard, no_shards):
+	"""Returns the contiguous range of tasks of the study that belong to shard number shard of no_shards."""
+	tasks = study_tasks(study)
+	return tasks[shard * len(tasks) // no_shards:(shard + 1) * len(tasks) // no_shards]
+
+def _population(study):
+	"""Returns the base set of the study and its standard deviation."""
+	SET = MC_calc.base_set(study["population_seed"], study["population_mean"], study["population_sd"], study["population_size"])
+	return SET, MC_calc.reference_uncertainty(SET)
+
+def _task_key(stage, no_draws, chunk_index):
+	"""Returns the key under which a task is stored in a shard file."""
+	return stage + "/" + str(no_draws) + "/" + str(chunk_index)
+
+def study_id(study):
+	"""Returns a short hash of the study, used in the names of its shard files so that shards of different studies can share a directory."""
+	return hashlib.sha256(json.dumps(study, sort_keys = True).encode()).hexdigest()[:12]
+
+def run_shard(study, shard, no_shards, output_dir = "."):
+	"""Calculates the tasks of shard number shard of no_shards and writes them to a .npz file in output_dir. The name of the file is returned. Every task is stored as the packed accumulators of the uncertainty measures, and the distribution tasks also store the deviations themselves unless stream_distributions is set."""
+	if study["sampling_seed"] is None:
+		raise ValueError("A sharded study needs a fixed sampling_seed")
+	SET, reference_stddev = _population(study)
+	population = MC_sampling.prepare_population(SET)
+	seed = MC_sampling.as_seed_sequence(study["sampling_seed"])
+	# The parameters of the uncertainty measures are part of the study, so shards calculated with different parameters are not merged
+	study = dict(study, estimators = list(MC_calc.ESTIMATORS), estimator_parameters = MC_calc.ESTIMATOR_PARAMETERS)
+	arrays = {"study" : np.array(json.dumps(study, sort_keys = True)), "bin_edges" : MC_streaming.BIN_EDGES}
+	for stage, no_draws, chunk_index in shard_tasks(study, shard, no_shards):
+		no_iterations = study["distribution_repetitions"] if stage == "distribution" else study["sweep_repetitions"]
+		deviations = MC_calc.deviation_chunk(population, reference_stddev, no_draws, chunk_index, study["chunk_size"], no_iterations, seed, study["replace"], stream = stage)
+		key = _task_key(stage, no_draws, chunk_index)
+		arrays[key] = np.array([MC_streaming.pack(MC_streaming.accumulate(deviations[name])) for name in MC_calc.ESTIMATORS])
+		if stage == "distribution" and not study["stream_distributions"]:
+			arrays[key + "/deviations"] = np.array([deviations[name] for name in MC_calc.ESTIMATORS])
+	# Write to a temporary file first, so an interrupted shard never leaves a partial result behind
+	filename = os.path.join(output_dir, "shard-%s-%04d-of-%04d.npz" % (study_id(study), shard, no_shards))
+	with open(filename + ".tmp", "wb") as shard_file:
+		np.savez(shard_file, **arrays)
+	os.replace(filename + ".tmp", filename)
+	return filename
+
+def merge_shards(filenames, output_dir = "."):
+	"""Merges the shard files of one study and writes the App-deviations, App-convergence (unless stream_distributions is set) and App-development result directories to output_dir. Every task of the study has to be present exactly once."""
+	study = None
+	results = {}
+	for filename in filenames:
+		with np.load(filename) as shard:
+			shard_study = json.loads(str(shard["study"]))
+			if study is None: study, bin_edges = shard_study, shard["bin_edges"]
+			elif shard_study != study: raise ValueError(filename + " belongs to a different study")
+			for key in shard.files:
+				if key in ("study", "bin_edges"): continue
+				if key in results: raise ValueError("Task " + key + " is present in more than one shard")
+				results[key] = shard[key]
+	if study is None:
+		raise ValueError("No shard files given")
+	missing = [_task_key(*task) for task in study_tasks(study) if _task_key(*task) not in results]
+	if missing:
+		raise ValueError(str(len(missing)) + " tasks are missing, starting with " + missing[0])
+
+	def accumulators(stage, no_draws, no_iterations):
+		"""Merges the accumulators of the chunks of one subsample size in chunk order."""
+		chunks = [results[_task_key(stage, no_draws, chunk_index)] for chunk_index in range((no_iterations + study["chunk_size"] - 1) // study["chunk_size"])]
+		return dict((name, MC_streaming.merge_all([MC_streaming.unpack(chunk[estimator_index], bin_edges) for chunk in chunks], bin_edges)) for estimator_index, name in enumerate(MC_calc.ESTIMATORS))
+
+	SET = _population(study)[0]
+	metadata = MC_calc.run_metadata(study["population_seed"], study["sampling_seed"], study["replace"], study["chunk_size"], {"distribution" : "normal", "mean" : study["population_mean"], "sd" : study["population_sd"], "size" : study["population_size"]})
+	metadata.update(estimators = study["estimators"], estimator_parameters = study["estimator_parameters"])
+	no_draws = study["distribution_draws"]
+	no_repetitions = study["distribution_repetitions"]
+	frac_stddev = None
+	if not study["stream_distributions"]:
+		chunks = [results[_task_key("distribution", no_draws, chunk_index) + "/deviations"] for chunk_index in range((no_repetitions + study["chunk_size"] - 1) // study["chunk_size"])]
+		frac_stddev = dict((name, np.concatenate([chunk[estimator_index] for chunk in chunks])) for estimator_index, name in enumerate(MC_calc.ESTIMATORS))
+	deviations = MC_calc.deviation_dictionary(SET, no_draws, accumulators("distribution", no_draws, no_repetitions), frac_stddev)
+	MC_store.save_results(os.path.join(output_dir, "App-deviations"), deviations, dict(metadata, N = no_draws, repetitions = no_repetitions))
+
+	if frac_stddev is not None:
+		checkpoints = None
+		if study["convergence_points"] is not None: checkpoints = MC_convergence.log_checkpoints(no_repetitions, study["convergence_points"])
+		convergence = MC_convergence.convergence_curves(frac_stddev, MC_calc.ESTIMATORS, checkpoints)
+		convergence["no_draws"] = no_draws
+		MC_store.save_results(os.path.join(output_dir, "App-convergence"), convergence, dict(metadata, N = no_draws, repetitions = no_repetitions))
+
+	development = MC_calc.development_dictionary([accumulators("development", size, study["sweep_repetitions"]) for size in study["sizes"]])
+	MC_store.save_results(os.path.join(output_dir, "App-development"), development, dict(metadata, N = study["sizes"], repetitions = study["sweep_repetitions"]))
+	return study
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Run or merge the shards of a Monte-Carlo study.")
+	commands = parser.add_subparsers(dest = "command", required = True)
+	run = commands.add_parser("run", help = "calculate one shard")
+	run.add_argument("--shard", type = int, required = True, help = "number of this shard, starting at 0")
+	run.add_argument("--shards", type = int, required = True, help = "total number of shards")
+	run.add_argument("--study", help = "JSON file with the study, defaults to the study of Appendix_MC_calculation.py")
+	run.add_argument("--output-dir", default = ".")
+	merge = commands.add_parser("merge", help = "merge shard files into the App-* result directories")
+	merge.add_argument("files", nargs = "+")
+	merge.add_argument("--output-dir", default = ".")
+	commands.add_parser("study", help = "print the default study as JSON")
+	arguments = parser.parse_args(arguments)
+
+	if arguments.command == "run":
+		if not 0 <= arguments.shard < arguments.shards:
+			parser.error("--shard has to be between 0 and --shards - 1")
+		study = dict(DEFAULT_STUDY)
+		if arguments.study: study.update(json.load(open(arguments.study)))
+		print("Shard saved to " + run_shard(study, arguments.shard, arguments.shards, arguments.output_dir))
+	elif arguments.command == "merge":
+		merge_shards(arguments.files, arguments.output_dir)
+		print("Shards succesfully merged")
+	else:
+		json.dump(DEFAULT_STUDY, sys.stdout, indent = 1)
+		print("")
+
+if __name__=="__main__":
+	main()
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+#################
+# Storage of the results of the Monte-Carlo calculation.
+# A result set (for example the deviations dictionary) is stored as a directory with one
+# .npy file per array and a JSON manifest, which holds the scalar results, the shape and
+# dtype of every array and the metadata of the run (N, repetitions, seeds and the parameters
+# of the uncertainty measures). Arrays are read lazily and memory-mapped, so only the
+# columns that are used are loaded, without copying them into memory.
+
+import json
+import os
+from collections.abc import Mapping
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+def _json_value(value):
+	"""Converts numpy scalars and arrays in metadata to plain Python values."""
+	if isinstance(value, dict): return dict((key, _json_value(item)) for key, item in value.items())
+	if isinstance(value, (list, tuple, range)): return [_json_value(item) for item in value]
+	if isinstance(value, (np.generic, np.ndarray)): return value.tolist()
+	return value
+
+def save_results(path, results, metadata = None):
+	"""Saves a dictionary of results to the directory path. Arrays are written to name.npy, scalars are written to the manifest together with metadata. The manifest is written last, so a result set with a manifest is always complete."""
+	os.makedirs(path, exist_ok = True)
+	if os.path.exists(os.path.join(path, MANIFEST)):
+		os.remove(os.path.join(path, MANIFEST))
+	columns = {}
+	scalars = {}
+	for key, value in results.items():
+		if np.ndim(value) == 0:
+			scalars[key] = _json_value(value)
+			continue
+		value = np.asarray(value)
+		np.save(os.path.join(path, key + ".npy"), value)
+		columns[key] = {"shape" : list(value.shape), "dtype" : value.dtype.str}
+	manifest = {"columns" : columns, "scalars" : scalars, "metadata" : _json_value(metadata or {})}
+	with open(os.path.join(path, MANIFEST + ".tmp"), "w") as manifest_file:
+		json.dump(manifest, manifest_file, indent = 1)
+	os.replace(os.path.join(path, MANIFEST + ".tmp"), os.path.join(path, MANIFEST))
+
+def read_manifest(path):
+	"""Returns the manifest of the result set in the directory path."""
+	with open(os.path.join(path, MANIFEST)) as manifest_file:
+		return json.load(manifest_file)
+
+class ResultSet(Mapping):
+	"""Read-only dictionary view of a saved result set. The arrays are only read when they are accessed, memory-mapped when mmap is true. The metadata of the run is available as the metadata attribute."""
+
+	def __init__(self, path, mmap = True):
+		self.path = path
+		self.mmap = mmap
+		self.manifest = read_manifest(path)
+		self.metadata = self.manifest["metadata"]
+		self._arrays = {}
+
+	def __getitem__(self, key):
+		if key in self.manifest["scalars"]:
+			return self.manifest["scalars"][key]
+		if key not in self.manifest["columns"]:
+			raise KeyError(key)
+		if key not in self._arrays:
+			self._arrays[key] = np.load(os.path.join(self.path, key + ".npy"), mmap_mode = "r" if self.mmap else None)
+		return self._arrays[key]
+
+	def __iter__(self):
+		return iter(list(self.manifest["scalars"]) + list(self.manifest["columns"]))
+
+	def __len__(self):
+		return len(self.manifest["scalars"]) + len(self.manifest["columns"])
+
+def load_results(path, keys = None, mmap = True):
+	"""Opens the result set in the directory path. When keys is given, only these results are read and returned as a dictionary, otherwise a lazy ResultSet is returned."""
+	results = ResultSet(path, mmap)
+	if keys is None:
+		return results
+	return dict((key, results[key]) for key in keys)
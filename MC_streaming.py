@@ -0,0 +1,101 @@
+#!/usr/bin/python
+#################
+# Fixed-size accumulators for the deviations of the uncertainty measures.
+# An accumulator is a dictionary holding the count, mean and M2 (sum of squared differences
+# from the mean, as in Welford's algorithm), the min/max and a fixed-bin histogram of the
+# deviations it has seen. Accumulators of separate chunks can be merged exactly, so the
+# memory use does not depend on the number of repetitions. Merging the chunks in a fixed
+# order gives the same result regardless of where or when the chunks were calculated.
+
+import numpy as np
+
+# Bin edges of the histograms of the deviations. A deviation can not be smaller than -1.
+BIN_EDGES = np.linspace(-1., 4., 501)
+
+def new_accumulator(bin_edges = BIN_EDGES):
+	"""Returns an empty accumulator with a histogram over bin_edges. Deviations outside the bins are counted in "underflow" and "overflow"."""
+	return {"count" : 0, "mean" : 0., "M2" : 0., "min" : np.inf, "max" : -np.inf, "bin_edges" : np.asarray(bin_edges, dtype=float), "hist" : np.zeros(len(bin_edges) - 1, dtype=np.int64), "underflow" : 0, "overflow" : 0}
+
+def accumulate(values, bin_edges = BIN_EDGES):
+	"""Takes an array of deviations and returns an accumulator holding them."""
+	values = np.asarray(values, dtype=float)
+	accumulator = new_accumulator(bin_edges)
+	if len(values) == 0:
+		return accumulator
+	accumulator["count"] = len(values)
+	accumulator["mean"] = values.mean()
+	accumulator["M2"] = ((values - accumulator["mean"])**2).sum()
+	accumulator["min"] = values.min()
+	accumulator["max"] = values.max()
+	accumulator["hist"] = np.histogram(values, accumulator["bin_edges"])[0].astype(np.int64)
+	accumulator["underflow"] = int(np.count_nonzero(values < accumulator["bin_edges"][0]))
+	accumulator["overflow"] = int(np.count_nonzero(values > accumulator["bin_edges"][-1]))
+	return accumulator
+
+def merge(first, second):
+	"""Returns a new accumulator holding the deviations of both accumulators. The moments are combined with the parallel algorithm of Chan et al. Both accumulators must use the same bins."""
+	if not np.array_equal(first["bin_edges"], second["bin_edges"]):
+		raise ValueError("Accumulators with different bin edges can not be merged")
+	if second["count"] == 0: return dict(first, hist = first["hist"].copy())
+	if first["count"] == 0: return dict(second, hist = second["hist"].copy())
+	count = first["count"] + second["count"]
+	delta = second["mean"] - first["mean"]
+	merged = dict(first)
+	merged["count"] = count
+	merged["mean"] = first["mean"] + delta * second["count"] / count
+	merged["M2"] = first["M2"] + second["M2"] + delta**2 * first["count"] * second["count"] / count
+	merged["min"] = min(first["min"], second["min"])
+	merged["max"] = max(first["max"], second["max"])
+	merged["hist"] = first["hist"] + second["hist"]
+	merged["underflow"] = first["underflow"] + second["underflow"]
+	merged["overflow"] = first["overflow"] + second["overflow"]
+	return merged
+
+def merge_all(accumulators, bin_edges = BIN_EDGES):
+	"""Merges a sequence of accumulators from left to right."""
+	merged = new_accumulator(bin_edges)
+	for accumulator in accumulators:
+		merged = merge(merged, accumulator)
+	return merged
+
+def summary(accumulator, sample = True):
+	"""Returns the mean and the standard deviation of the deviations in the accumulator, as a dictionary with keys "mean" and "uncertainty", like stddev in Appendix_MC_calculation.py."""
+	if sample: uncert = np.sqrt(accumulator["M2"] / (accumulator["count"] - 1.))
+	else: uncert = np.sqrt(accumulator["M2"] / accumulator["count"])
+	return {"mean" : accumulator["mean"], "uncertainty" : uncert}
+
+def rebin(accumulator, no_bins):
+	"""Returns the counts and bin edges of the histogram of the accumulator, with neighbouring bins combined so that the range between the lowest and highest occupied bin is covered by at most no_bins bins."""
+	occupied = np.nonzero(accumulator["hist"])[0]
+	if len(occupied) == 0:
+		return accumulator["hist"], accumulator["bin_edges"]
+	first, last = occupied[0], occupied[-1] + 1
+	group = max(1, int(np.ceil((last - first) / float(no_bins))))
+	last = min(first + group * int(np.ceil((last - first) / float(group))), len(accumulator["hist"]))
+	counts = np.add.reduceat(accumulator["hist"][first:last], np.arange(0, last - first, group))
+	edges = accumulator["bin_edges"][first:last + 1][::group]
+	if len(edges) == len(counts): edges = np.append(edges, accumulator["bin_edges"][last])
+	return counts, edges
+
+# Number of scalar fields in front of the histogram in a packed accumulator
+_PACKED_FIELDS = ("count", "mean", "M2", "min", "max", "underflow", "overflow")
+
+def pack(accumulator):
+	"""Returns the accumulator as a single float array (the scalar fields followed by the histogram), for storage in .npy/.npz files. The counts are stored exactly up to 2^53."""
+	return np.concatenate(([accumulator[field] for field in _PACKED_FIELDS], accumulator["hist"])).astype(float)
+
+def unpack(packed, bin_edges = BIN_EDGES):
+	"""Returns the accumulator stored in a packed array by pack."""
+	accumulator = new_accumulator(bin_edges)
+	for index, field in enumerate(_PACKED_FIELDS):
+		accumulator[field] = packed[index]
+	for field in ("count", "underflow", "overflow"):
+		accumulator[field] = int(accumulator[field])
+	accumulator["hist"] = packed[len(_PACKED_FIELDS):].astype(np.int64)
+	if len(accumulator["hist"]) != len(accumulator["bin_edges"]) - 1:
+		raise ValueError("The packed accumulator does not match the bin edges")
+	return accumulator
+
+def accumulate_chunks(values, chunk_size, bin_edges = BIN_EDGES):
+	"""Takes an array of deviations and returns the accumulator obtained by accumulating every chunk of chunk_size values and merging the chunks in order. This gives the same result as streaming the chunks one by one."""
+	return merge_all([accumulate(values[start:start + chunk_size], bin_edges) for start in range(0, len(values), chunk_size)], bin_edges)
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+#################
+# Checks that MC_bulk.py gives the same results as the scalar uncertainty measures of
+# Appendix_MC_calculation.py applied to every group, also when a group is split over several
+# chunks of the file, and that measures which are not defined for groups of one or two
+# measurements give NaN.
+#
+# Usage:
+#   python -m pytest test_bulk.py   (or: python test_bulk.py)
+
+import csv
+import os
+import tempfile
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_bulk
+
+# Number of measurements of every group, including groups of one and two measurements
+GROUP_SIZES = [1, 2, 3, 10, 2, 1, 7, 4, 25, 1]
+
+def measurements(seed = 0):
+	"""Returns the group ids and values of the groups in GROUP_SIZES, with the rows of a group next to each other."""
+	rng = np.random.default_rng(seed)
+	group_ids = np.repeat(["group" + str(group) for group in range(len(GROUP_SIZES))], GROUP_SIZES)
+	return group_ids, rng.normal(100, 20, sum(GROUP_SIZES))
+
+def check_results(results, group_ids, values):
+	results = dict((column, np.concatenate([chunk[column] for chunk in results])) for column in ["group", "n", "mean"] + list(MC_calc.ESTIMATORS))
+	assert results["group"].tolist() == ["group" + str(group) for group in range(len(GROUP_SIZES))]
+	assert results["n"].tolist() == GROUP_SIZES
+	starts = np.cumsum([0] + GROUP_SIZES[:-1])
+	for group, (start, length) in enumerate(zip(starts, GROUP_SIZES)):
+		subset = values[start:start + length]
+		assert results["mean"][group] == MC_calc.minmax(subset)["mean"], group
+		for name in MC_calc.ESTIMATORS:
+			if length < MC_bulk.MINIMUM_GROUP_SIZE.get(name, 1):
+				assert np.isnan(results[name][group]), (name, length)
+			else:
+				assert results[name][group] == getattr(MC_calc, name)(subset)["uncertainty"], (name, length)
+
+def test_split_groups_equal_scalar():
+	group_ids, values = measurements()
+	# Chunks smaller than a group split it over several chunks
+	for chunk_rows in (1, 3, 8, len(values)):
+		chunks = [(group_ids[start:start + chunk_rows], values[start:start + chunk_rows]) for start in range(0, len(values), chunk_rows)]
+		check_results(list(MC_bulk.bulk_uncertainties(chunks)), group_ids, values)
+
+def test_csv_chunks_equal_scalar():
+	group_ids, values = measurements(1)
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "data.csv")
+		with open(path, "w", newline = "") as csv_file:
+			writer = csv.writer(csv_file)
+			writer.writerow(["sample_id", "value"])
+			writer.writerows(zip(group_ids.tolist(), [repr(value) for value in values.tolist()]))
+		check_results(list(MC_bulk.bulk_uncertainties(MC_bulk.read_chunks(path, "sample_id", "value", chunk_rows = 3))), group_ids, values)
+
+if __name__=="__main__":
+	test_split_groups_equal_scalar()
+	test_csv_chunks_equal_scalar()
+	print("The bulk results equal the scalar uncertainty measures")
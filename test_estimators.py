@@ -0,0 +1,131 @@
+#!/usr/bin/python
+#################
+# Checks that the uncertainty measures of Appendix_MC_calculation.py give exactly the same
+# results as the original implementation of the article, for the scalar and the batched
+# versions, including subsamples with ties. The original functions are kept below as the
+# reference.
+#
+# Usage:
+#   python -m pytest test_estimators.py   (or: python test_estimators.py)
+
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+
+SIZES = list(range(3, 25)) + [50]
+
+# The original uncertainty measures, as published with the article
+def reference_stddev(sample_set, sample = True):
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	if sample: uncert = np.sqrt(1./(len(sample_set)-1.) * sum((sample_set-meanval)**2) )
+	else: uncert = np.sqrt(1./len(sample_set) * sum((sample_set-meanval)**2) )
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def reference_minmax(sample_set):
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	mindist = meanval - min(sample_set)
+	maxdist = max(sample_set) - meanval
+	uncert = max(mindist, maxdist)
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def reference_exclextr(sample_set):
+	extremesexcluded = 1
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	sample_set = sorted(sample_set)[extremesexcluded:len(sample_set) - extremesexcluded]
+	mindist = meanval - min(sample_set)
+	maxdist = max(sample_set) - meanval
+	uncert = max(mindist, maxdist)
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def reference_middle(sample_set):
+	percentage = 50
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	sample_set = sorted(sample_set)
+	cutmeasurements = int((percentage/2.)/100.*len(sample_set))
+	sample_set = sample_set[cutmeasurements:len(sample_set) - cutmeasurements]
+	mindist = meanval - min(sample_set)
+	maxdist = max(sample_set) - meanval
+	uncert = max(mindist, maxdist)
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def _reference_closest_fraction(sample_set, fraction):
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	differences = np.abs(sample_set - meanval)
+	N = len(sample_set)
+	abs_percentage_difference = np.abs((np.arange(N)+1.)/N - fraction)
+	smallest_percentage_difference = min(abs_percentage_difference)
+	smallest_id = np.argwhere(abs_percentage_difference == smallest_percentage_difference)[0][0]
+	number_of_items_to_discard = N-(smallest_id+1)
+	for i in range(number_of_items_to_discard):
+		cut_index = np.where(differences == max(differences))[0][0]
+		sample_set = np.delete(sample_set, cut_index)
+		differences = np.delete(differences, cut_index)
+	mindist = meanval - min(sample_set)
+	maxdist = max(sample_set) - meanval
+	uncert = max(mindist, maxdist)
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def reference_percmeas(sample_set):
+	return _reference_closest_fraction(sample_set, .76)
+
+def reference_close68(sample_set):
+	return _reference_closest_fraction(sample_set, 0.68)
+
+def reference_mad(sample_set):
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	uncert = 1.*sum( np.abs( sample_set - meanval ) )/ len(sample_set)
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+def reference_iqr(sample_set):
+	meanval = 1.*sum(sample_set)/len(sample_set)
+	sample_set = sorted(sample_set)
+	if (len(sample_set) % 2 == 0):
+		lower_quart = sample_set[:int(len(sample_set)/2)]
+		upper_quart = sample_set[int(len(sample_set)/2):]
+	else:
+		lower_quart = sample_set[:int(len(sample_set)/2+1)]
+		upper_quart = sample_set[int(len(sample_set)/2):]
+	uncert = max(np.abs(np.median(lower_quart) - meanval), np.abs(np.median(upper_quart) - meanval))
+	return {"mean" : meanval, "uncertainty" : uncert}
+
+REFERENCE = {
+	"minmax" : reference_minmax,
+	"exclextr" : reference_exclextr,
+	"percmeas" : reference_percmeas,
+	"middle" : reference_middle,
+	"mad" : reference_mad,
+	"iqr" : reference_iqr,
+	"close68" : reference_close68,
+	"stddev" : reference_stddev,
+}
+
+def subsamples(no_draws, rows = 200, seed = 0):
+	"""Returns rows subsamples of no_draws values, of which some contain ties: repeated values, constant rows and values at the same distance from the mean."""
+	rng = np.random.default_rng(seed + no_draws)
+	subsets = rng.normal(100, 20, (rows, no_draws))
+	subsets[:10, 1] = subsets[:10, 0]
+	subsets[10:20] = np.round(subsets[10:20] / 10.) * 10.
+	subsets[20:25] = 3.
+	# Symmetric rows, so that pairs of values are at exactly the same distance from the mean
+	half = rng.integers(1, 5, (10, no_draws // 2)) * 2.
+	subsets[25:35, :no_draws // 2] = 100. - half
+	subsets[25:35, no_draws - no_draws // 2:] = 100. + half
+	if no_draws % 2: subsets[25:35, no_draws // 2] = 100.
+	return subsets
+
+def test_scalar_and_batch_equal_reference():
+	for no_draws in SIZES:
+		subsets = subsamples(no_draws)
+		uncertainties = MC_calc.uncertainties_batch(subsets)
+		for name in MC_calc.ESTIMATORS:
+			batch = MC_calc.BATCH_ESTIMATORS[name](subsets)
+			reference = [REFERENCE[name](np.array(row)) for row in subsets]
+			scalar = [getattr(MC_calc, name)(np.array(row)) for row in subsets]
+			expected = np.array([result["uncertainty"] for result in reference])
+			assert np.array_equal(np.array([result["uncertainty"] for result in scalar]), expected), (name, no_draws)
+			assert np.array_equal(batch["uncertainty"], expected), (name, no_draws)
+			assert np.array_equal(uncertainties[name], expected), (name, no_draws)
+			assert np.array_equal(batch["mean"], np.array([result["mean"] for result in reference])), (name, no_draws)
+
+if __name__=="__main__":
+	test_scalar_and_batch_equal_reference()
+	print("All uncertainty measures equal the reference")
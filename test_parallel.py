@@ -0,0 +1,27 @@
+#!/usr/bin/python
+#################
+# Checks that the parallel sample size sweep of MC_parallel.py gives exactly the same
+# development dictionary for any number of worker processes.
+#
+# Usage:
+#   python -m pytest test_parallel.py   (or: python test_parallel.py)
+
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_parallel
+
+SIZES = [4, 7, 10, 20]
+
+def test_sweep_independent_of_workers():
+	SET = MC_calc.base_set()
+	reference_stddev = MC_calc.reference_uncertainty(SET)
+	# The last chunk is shorter than the others
+	serial = MC_parallel.sample_size_sweep(SET, reference_stddev, SIZES, 2500, seed = 2, workers = 1, chunk_size = 1000)
+	parallel = MC_parallel.sample_size_sweep(SET, reference_stddev, SIZES, 2500, seed = 2, workers = 2, chunk_size = 1000)
+	assert sorted(serial) == sorted(parallel)
+	for key in serial:
+		assert np.array_equal(serial[key], parallel[key]), key
+
+if __name__=="__main__":
+	test_sweep_independent_of_workers()
+	print("The sample size sweep is independent of the number of workers")
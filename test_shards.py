@@ -0,0 +1,51 @@
+#!/usr/bin/python
+#################
+# Checks that a study calculated in shards by MC_shards.py, with the shard files merged in a
+# shuffled order, gives exactly the same distributions, convergence and sample size sweep as
+# calculating it directly with draw_set and MC_parallel.sample_size_sweep.
+#
+# Usage:
+#   python -m pytest test_shards.py   (or: python test_shards.py)
+
+import os
+import random
+import tempfile
+import numpy as np
+import Appendix_MC_calculation as MC_calc
+import MC_convergence
+import MC_parallel
+import MC_shards
+import MC_store
+import MC_streaming
+
+# A small study, of which the last chunk of every stage is shorter than the others
+STUDY = dict(MC_shards.DEFAULT_STUDY, chunk_size = 1000, stream_distributions = False, convergence_points = None, distribution_repetitions = 2500, sizes = [4, 5, 10], sweep_repetitions = 1500)
+
+def assert_results_equal(path, expected):
+	stored = MC_store.load_results(path)
+	assert sorted(stored) == sorted(expected), path
+	for key in expected:
+		assert np.array_equal(stored[key], expected[key], equal_nan = True), (path, key)
+
+def test_shuffled_shards_equal_direct():
+	SET = MC_calc.base_set(STUDY["population_seed"], STUDY["population_mean"], STUDY["population_sd"], STUDY["population_size"])
+	reference_stddev = MC_calc.reference_uncertainty(SET)
+	no_draws, no_repetitions = STUDY["distribution_draws"], STUDY["distribution_repetitions"]
+	frac_stddev = dict(zip(MC_calc.ESTIMATORS, MC_calc.draw_set(SET, no_repetitions, no_draws, True, STUDY["chunk_size"], seed = STUDY["sampling_seed"], reference_stddev = reference_stddev)))
+	accumulators = dict((name, MC_streaming.accumulate_chunks(frac_stddev[name], STUDY["chunk_size"])) for name in MC_calc.ESTIMATORS)
+	deviations = MC_calc.deviation_dictionary(SET, no_draws, accumulators, frac_stddev)
+	convergence = MC_convergence.convergence_curves(deviations, MC_calc.ESTIMATORS)
+	convergence["no_draws"] = no_draws
+	development = MC_parallel.sample_size_sweep(SET, reference_stddev, STUDY["sizes"], STUDY["sweep_repetitions"], seed = STUDY["sampling_seed"], workers = 1, chunk_size = STUDY["chunk_size"])
+
+	with tempfile.TemporaryDirectory() as directory:
+		filenames = [MC_shards.run_shard(STUDY, shard, 4, directory) for shard in range(4)]
+		random.Random(0).shuffle(filenames)
+		MC_shards.merge_shards(filenames, directory)
+		assert_results_equal(os.path.join(directory, "App-deviations"), deviations)
+		assert_results_equal(os.path.join(directory, "App-convergence"), convergence)
+		assert_results_equal(os.path.join(directory, "App-development"), development)
+
+if __name__=="__main__":
+	test_shuffled_shards_equal_direct()
+	print("The merged shards equal the direct calculation")
@@ -0,0 +1,41 @@
+#!/usr/bin/python
+#################
+# Checks that merging the accumulators of MC_streaming.py chunk by chunk gives the same
+# count, histogram, minimum and maximum as accumulating all deviations at once, and the same
+# moments up to rounding.
+#
+# Usage:
+#   python -m pytest test_streaming.py   (or: python test_streaming.py)
+
+import numpy as np
+import MC_streaming
+
+def deviations(seed = 0):
+	"""Returns deviations of which some fall outside the bins of the histogram."""
+	rng = np.random.default_rng(seed)
+	values = rng.normal(0.2, 0.6, 25000)
+	values[:50] = -1.5
+	values[50:100] = 6.
+	return rng.permutation(values)
+
+def test_merged_chunks_equal_accumulate():
+	values = deviations()
+	expected = MC_streaming.accumulate(values)
+	# Chunks of unequal length, including an empty one
+	bounds = [0, 1, 1000, 1000, 7777, 20000, len(values)]
+	merged = MC_streaming.merge_all([MC_streaming.accumulate(values[start:end]) for start, end in zip(bounds[:-1], bounds[1:])])
+	for field in ("count", "min", "max", "underflow", "overflow"):
+		assert merged[field] == expected[field], field
+	assert np.array_equal(merged["hist"], expected["hist"])
+	assert np.isclose(merged["mean"], expected["mean"], rtol = 1e-12, atol = 0)
+	assert np.isclose(merged["M2"], expected["M2"], rtol = 1e-12, atol = 0)
+	assert np.isclose(MC_streaming.summary(merged)["uncertainty"], np.std(values, ddof = 1), rtol = 1e-12, atol = 0)
+	# Streaming fixed-size chunks gives the same result, and survives packing
+	streamed = MC_streaming.unpack(MC_streaming.pack(MC_streaming.accumulate_chunks(values, 1000)))
+	assert streamed["count"] == expected["count"]
+	assert np.array_equal(streamed["hist"], expected["hist"])
+	assert np.isclose(streamed["M2"], expected["M2"], rtol = 1e-12, atol = 0)
+
+if __name__=="__main__":
+	test_merged_chunks_equal_accumulate()
+	print("The merged accumulators equal the accumulator of all deviations")